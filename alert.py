@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+
+from config import get_config
+from rules import severity_rank
+from storage import write_json_atomic, read_json
+
+ALERT_DIR = Path('data/alert')
+QUEUE_DIR = ALERT_DIR / 'queue'
+FAILED_DIR = ALERT_DIR / 'failed'
+STATE_FILE = ALERT_DIR / 'state.json'
+
+# アラート対象とする最低の重要度
+MIN_ALERT_SEVERITY = 'warning'
+
+# 処理中ロックがこの秒数より古い場合は異常終了の残骸とみなして戻す
+STALE_LOCK_SECONDS = 600
+
+_state_lock = threading.Lock()
+
+
+# 重複抑止
+def alert_key(issue):
+    """重複判定キー（デバイス＋問題種別）"""
+    device = issue.get('serial') or issue.get('device') or 'host'
+    return f"{device}|{issue.get('attribute')}"
+
+
+def should_alert(state, key, severity, now, suppress_seconds, value=None):
+    """抑止期間・エスカレーションを考慮して通知要否を判定
+
+    - 初回、または重要度が上がった場合（エスカレーション）は常に通知
+    - 抑止期間中は通知しない
+    - 抑止期間経過後は値が変化していれば再通知する
+
+    戻り値は (通知するか, 前回の重要度)。
+    """
+    previous = state.get(key)
+    if previous is None:
+        return True, None
+    previous_severity = previous.get('severity')
+    if severity_rank(severity) > severity_rank(previous_severity):
+        return True, previous_severity
+    if now - previous.get('last_sent', 0) < suppress_seconds:
+        return False, previous_severity
+    return value != previous.get('value'), previous_severity
+
+
+def resolve_missing(state, active_keys):
+    """今回の判定で検出されなかった問題を解消済みとして状態から除く"""
+    for key in [key for key in state if key not in active_keys]:
+        del state[key]
+
+
+def collapse_issues(issues):
+    """同一キーの問題点を最も重要度の高いものに集約"""
+    collapsed = {}
+    for issue in issues:
+        if severity_rank(issue.get('severity')) < severity_rank(MIN_ALERT_SEVERITY):
+            continue
+        key = alert_key(issue)
+        current = collapsed.get(key)
+        if current is None or severity_rank(issue['severity']) > severity_rank(current['severity']):
+            collapsed[key] = issue
+    return collapsed
+
+
+def build_payload(issue, previous_severity=None):
+    """通知用の構造化ペイロードを作成"""
+    device = issue.get('device') or 'host'
+    message = f"{device} {issue.get('attribute')}: {issue.get('severity')}"
+    if issue.get('delta') is not None:
+        message += f" (変化量 {issue['delta']:+})"
+    return {
+        'id': uuid.uuid4().hex,
+        'created_at': datetime.datetime.now().isoformat(),
+        'host': socket.gethostname(),
+        'device': issue.get('device'),
+        'serial': issue.get('serial'),
+        'model': issue.get('model'),
+        'attribute': issue.get('attribute'),
+        'severity': issue.get('severity'),
+        'previous_severity': previous_severity,
+        'value': issue.get('value'),
+        'delta': issue.get('delta'),
+        'source': issue.get('source'),
+        'message': message,
+    }
+
+
+def _load_state():
+    """重複抑止状態の読み込み（壊れている場合は記録して空の状態から始める）"""
+    try:
+        state = read_json(STATE_FILE, {})
+    except ValueError as e:
+        print(f"アラート状態読み込みエラー（状態を初期化）: {repr(e)}", file=sys.stderr, flush=True)
+        return {}
+    if not isinstance(state, dict):
+        print(f"アラート状態の形式が不正です（状態を初期化）: {type(state).__name__}", file=sys.stderr, flush=True)
+        return {}
+    return state
+
+
+# キュー登録
+def submit_alerts(issues, now=None, resolve=False):
+    """問題点を重複抑止したうえでキューに登録（通知自体は行わない）
+
+    resolve=True の場合、issues を全問題の一覧とみなし、含まれない問題を解消済みにする。
+    戻り値は登録したペイロードのリスト。
+    """
+    queued = []
+    try:
+        config = get_config()
+        suppress_seconds = config.alert_suppress_hours * 3600
+        if now is None:
+            now = time.time()
+
+        with _state_lock:
+            state = _load_state()
+            before = dict(state)
+            collapsed = collapse_issues(issues)
+            if resolve:
+                resolve_missing(state, collapsed)
+            for key, issue in collapsed.items():
+                send, previous_severity = should_alert(
+                    state, key, issue['severity'], now, suppress_seconds, issue.get('value'))
+                if not send:
+                    print(f"アラート抑止: {key} ({issue['severity']})", file=sys.stderr, flush=True)
+                    continue
+                payload = build_payload(issue, previous_severity)
+                enqueue(payload)
+                state[key] = {'severity': issue['severity'], 'value': issue.get('value'), 'last_sent': now}
+                queued.append(payload)
+            if state != before:
+                write_json_atomic(STATE_FILE, state)
+
+        if queued:
+            print(f"アラート登録: {len(queued)}件", file=sys.stderr, flush=True)
+            notify_dispatcher()
+    except Exception as e:
+        print(f"アラート登録エラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+    return queued
+
+
+def enqueue(payload):
+    """ペイロードを永続キューに書き込む"""
+    record = {
+        'payload': payload,
+        'attempts': 0,
+        'next_attempt': 0,
+        'delivered': {},
+    }
+    filename = f"{time.strftime('%Y%m%d_%H%M%S')}_{payload['id']}.json"
+    write_json_atomic(QUEUE_DIR / filename, record)
+
+
+# 送信
+def run_alert_command(command, payload, timeout):
+    """アラートコマンド実行（ペイロードを標準入力と環境変数で渡す）"""
+    env = dict(os.environ)
+    for name in ('device', 'serial', 'model', 'attribute', 'severity', 'previous_severity', 'value', 'delta', 'message'):
+        value = payload.get(name)
+        env[f"SMART_ALERT_{name.upper()}"] = '' if value is None else str(value)
+
+    result = subprocess.run(
+        ['bash', command, payload.get('device') or ''],
+        input=json.dumps(payload, ensure_ascii=False),
+        text=True,
+        env=env,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"アラートコマンド終了コード: {result.returncode}")
+
+
+def send_webhook(url, payload, timeout):
+    """Webhook送信（JSONをPOST）"""
+    import requests
+
+    response = requests.post(url, json=payload, timeout=timeout)
+    if not 200 <= response.status_code < 300:
+        raise RuntimeError(f"Webhook応答エラー: {response.status_code}")
+
+
+def _deliver(record, config):
+    """未送信のチャネルへ送信（全チャネル成功でTrue）"""
+    payload = record['payload']
+    delivered = record['delivered']
+    channels = []
+    if config.alert_command:
+        channels.append(('command', lambda: run_alert_command(
+            config.alert_command, payload, config.alert_command_timeout_seconds)))
+    if config.alert_webhook_url:
+        channels.append(('webhook', lambda: send_webhook(
+            config.alert_webhook_url, payload, config.alert_webhook_timeout_seconds)))
+
+    ok = True
+    for name, send in channels:
+        if delivered.get(name):
+            continue
+        try:
+            send()
+            delivered[name] = True
+            print(f"アラート通知実行 ({name}): {payload.get('message')}", file=sys.stderr, flush=True)
+        except Exception as e:
+            ok = False
+            print(f"アラート通知エラー ({name}): {repr(e)}", file=sys.stderr, flush=True)
+    return ok
+
+
+def _recover_stale_locks(now):
+    """異常終了で残った処理中ファイルをキューに戻す"""
+    for lock_path in QUEUE_DIR.glob('*.json.lock'):
+        try:
+            if now - lock_path.stat().st_mtime > STALE_LOCK_SECONDS:
+                os.replace(lock_path, lock_path.with_suffix(''))
+        except OSError:
+            continue
+
+
+def dispatch_pending(now=None):
+    """キュー内のアラートを送信（失敗時は再試行間隔を延ばして残す）
+
+    戻り値は送信完了した件数。
+    """
+    sent = 0
+    try:
+        if not QUEUE_DIR.exists():
+            return 0
+        config = get_config()
+        if now is None:
+            now = time.time()
+        _recover_stale_locks(now)
+
+        for path in sorted(QUEUE_DIR.glob('*.json')):
+            # 他プロセスと同時に処理しないようrenameで確保する
+            lock_path = path.with_name(path.name + '.lock')
+            try:
+                os.replace(path, lock_path)
+            except FileNotFoundError:
+                continue
+            # renameでは更新時刻が変わらないため、確保した時刻を記録して処理中ロックの経過時間の基準にする
+            os.utime(lock_path)
+
+            try:
+                try:
+                    record = read_json(lock_path)
+                except ValueError as e:
+                    record = e
+                if record is None:
+                    continue
+                if not isinstance(record, dict):
+                    # 壊れたレコードはキューに戻すと毎回失敗し続けるため送信失敗として退避する
+                    FAILED_DIR.mkdir(parents=True, exist_ok=True)
+                    os.replace(lock_path, FAILED_DIR / path.name)
+                    print(f"アラートキューの不正なレコードを退避: {path.name}: {repr(record)}", file=sys.stderr, flush=True)
+                    continue
+                if record.get('next_attempt', 0) > now:
+                    os.replace(lock_path, path)
+                    continue
+
+                if _deliver(record, config):
+                    lock_path.unlink()
+                    sent += 1
+                    continue
+
+                record['attempts'] = record.get('attempts', 0) + 1
+                if record['attempts'] >= config.alert_max_attempts:
+                    FAILED_DIR.mkdir(parents=True, exist_ok=True)
+                    write_json_atomic(FAILED_DIR / path.name, record)
+                    lock_path.unlink()
+                    print(f"アラート送信を断念: {path.name}", file=sys.stderr, flush=True)
+                else:
+                    # 指数バックオフで再試行
+                    record['next_attempt'] = now + config.alert_retry_seconds * (2 ** (record['attempts'] - 1))
+                    write_json_atomic(lock_path, record)
+                    os.replace(lock_path, path)
+            except Exception as e:
+                print(f"アラートキュー処理エラー {path.name}: {repr(e)}", file=sys.stderr, flush=True)
+                traceback.print_exc(file=sys.stderr)
+                if lock_path.exists():
+                    os.replace(lock_path, path)
+    except Exception as e:
+        print(f"アラート送信処理エラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+    return sent
+
+
+# バックグラウンド送信
+class AlertDispatcher(threading.Thread):
+    """キューを監視して送信するバックグラウンドスレッド"""
+
+    def __init__(self, poll_seconds=5):
+        super().__init__(name='alert-dispatcher', daemon=True)
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run(self):
+        print("アラート送信スレッド開始", file=sys.stderr, flush=True)
+        while not self._stop_event.is_set():
+            dispatch_pending()
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+
+_dispatcher = None
+
+
+def start_dispatcher():
+    """送信スレッドを起動（起動済みなら何もしない）"""
+    global _dispatcher
+    if _dispatcher is None or not _dispatcher.is_alive():
+        _dispatcher = AlertDispatcher()
+        _dispatcher.start()
+    return _dispatcher
+
+
+def notify_dispatcher():
+    """送信スレッドに即時処理を依頼"""
+    if _dispatcher is not None:
+        _dispatcher.notify()
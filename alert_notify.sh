@@ -11,19 +11,28 @@ EXE_PATH=`pwd`
 
 # アラート通知スクリプト
 # SMART監視システムで異常検出時に呼び出される
+# 第1引数: 対象デバイス（ホスト全体の判定時は空）
+# 標準入力: アラート内容（JSON）
+# 環境変数: SMART_ALERT_DEVICE / SERIAL / MODEL / ATTRIBUTE / SEVERITY /
+#           PREVIOUS_SEVERITY / VALUE / DELTA / MESSAGE
 
 TIMESTAMP=$(date '+%Y-%m-%d %H:%M:%S')
 HOSTNAME=$(hostname)
+DEVICE="${1:-${SMART_ALERT_DEVICE:-}}"
+PAYLOAD=$(cat)
 
 echo "===============================================" >&2
 echo "⚠️  SMART監視アラート - $TIMESTAMP" >&2
 echo "ホスト: $HOSTNAME" >&2
 echo "===============================================" >&2
-echo "ハードディスク/SSDで異常が検出されました。" >&2
-echo "詳細は分析結果ファイルを確認してください。" >&2
+echo "デバイス: ${DEVICE:-(ホスト全体)}" >&2
+echo "シリアル: ${SMART_ALERT_SERIAL:-}" >&2
+echo "属性: ${SMART_ALERT_ATTRIBUTE:-}" >&2
+echo "重要度: ${SMART_ALERT_SEVERITY:-} (前回: ${SMART_ALERT_PREVIOUS_SEVERITY:-なし})" >&2
+echo "値: ${SMART_ALERT_VALUE:-} 変化量: ${SMART_ALERT_DELTA:-}" >&2
 echo "" >&2
-echo "最新の分析結果:" >&2
-ls -la data/smart/*/analysis_*.json | tail -1 >&2
+echo "アラート内容:" >&2
+echo "$PAYLOAD" >&2
 echo "" >&2
 echo "推奨アクション:" >&2
 echo "1. 重要データのバックアップを直ちに実行" >&2
@@ -32,8 +41,7 @@ echo "3. 必要に応じてディスク交換を検討" >&2
 echo "===============================================" >&2
 
 # システムログにも記録
-logger "SMART Alert: Hard disk anomaly detected on $HOSTNAME"
+logger "SMART Alert: ${SMART_ALERT_MESSAGE:-Hard disk anomaly detected} on $HOSTNAME"
 
-# TODO: メール通知、Slack通知などを追加可能
-# mailx -s "SMART Alert: $HOSTNAME" admin@example.com < /dev/null
-# curl -X POST https://hooks.slack.com/... -d "text=SMART Alert: $HOSTNAME"
\ No newline at end of file
+# TODO: メール通知などを追加可能（Webhookは settings.json の alert_webhook_url で送信される）
+# echo "$PAYLOAD" | mailx -s "SMART Alert: $HOSTNAME" admin@example.com
\ No newline at end of file
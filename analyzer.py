@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import sys
+import threading
+import time
+import traceback
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from rules import severity_rank
+
+# APIキー未設定を表すテンプレートの値
+_PLACEHOLDER_KEYS = ('', 'YOUR_GEMINI_API_KEY')
+
+_STUB_STATUS = {
+    'info': '正常',
+    'notice': '注意',
+    'warning': '警告',
+    'critical': '危険',
+}
+
+
+class AnalyzerError(Exception):
+    """LLMバックエンドの呼び出しエラー（応答の形式不正など）"""
+
+
+class AnalyzerBackend(ABC):
+    """LLMバックエンドの基底クラス
+
+    timeout / batch_size に0以下を指定した場合はバックエンドごとの既定値を使う。
+    batch_size は1回の分析で同時に送るリクエスト数。
+    """
+    name = None
+    default_timeout = 60
+    default_batch_size = 1
+
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=0, batch_size=0):
+        self.model = model
+        self.api_key = api_key if api_key not in _PLACEHOLDER_KEYS else None
+        self.base_url = (base_url or '').rstrip('/')
+        self.timeout = timeout if timeout and timeout > 0 else self.default_timeout
+        self.batch_size = batch_size if batch_size and batch_size > 0 else self.default_batch_size
+        # requests.Session はスレッド間で共有しないため、ワーカースレッドごとに作る
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def unavailable_reason(self):
+        """呼び出せない場合の理由（呼び出せる場合はNone）"""
+        return None
+
+    @abstractmethod
+    def complete(self, prompt, issues=None):
+        """プロンプトに対する回答テキストを返す（失敗時は例外）"""
+
+    def session(self):
+        """接続を使い回すための呼び出し元スレッド専用のHTTPセッション（requestsは必要な時点で読み込む）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        """作成したHTTPセッションを全て閉じる"""
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+    def post_json(self, url, payload, headers=None):
+        """JSONをPOSTして応答JSONを返す（HTTPエラーはAnalyzerError）"""
+        response = self.session().post(url, json=payload, headers=headers or {}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise AnalyzerError(f"HTTP {response.status_code}: {response.text[:500]}")
+        return response.json()
+
+
+class GeminiBackend(AnalyzerBackend):
+    """Gemini API（generateContent）"""
+    name = 'gemini'
+    default_timeout = 60
+    default_batch_size = 4
+    default_base_url = 'https://generativelanguage.googleapis.com'
+
+    def unavailable_reason(self):
+        if not self.api_key:
+            return "LLM APIキーが設定されていません"
+        return None
+
+    def complete(self, prompt, issues=None):
+        url = f"{self.base_url or self.default_base_url}/v1beta/models/{self.model}:generateContent"
+        # APIキーはURLに含めずヘッダーで渡す（ログやプロキシに残さない）
+        headers = {'x-goog-api-key': self.api_key}
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        result = self.post_json(url, payload, headers)
+        try:
+            return result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            raise AnalyzerError(f"LLM応答が空です: {result}")
+
+
+class OpenAICompatibleBackend(AnalyzerBackend):
+    """OpenAI互換API（llama.cppのHTTPサーバーなどローカル推論サーバー）"""
+    name = 'openai'
+    # ローカル推論は1件ずつ順に処理されることが多いため、長めの待ち時間で直列に送る
+    default_timeout = 300
+    default_batch_size = 1
+    default_base_url = 'http://127.0.0.1:8080'
+
+    def complete(self, prompt, issues=None):
+        url = f"{self.base_url or self.default_base_url}/v1/chat/completions"
+        headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+        payload = {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': 0,
+        }
+        result = self.post_json(url, payload, headers)
+        try:
+            return result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise AnalyzerError(f"LLM応答が空です: {result}")
+
+
+class StubBackend(AnalyzerBackend):
+    """閾値判定結果から決定的な回答を作るスタブ（ネットワーク不要）"""
+    name = 'stub'
+    default_timeout = 1
+    default_batch_size = 32
+
+    def complete(self, prompt, issues=None):
+        severity = 'info'
+        for issue in issues or []:
+            if severity_rank(issue['severity']) > severity_rank(severity):
+                severity = issue['severity']
+        return f"- 状態: [{_STUB_STATUS[severity]}]\n- 主な問題: 閾値判定 {len(issues or [])}件"
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (GeminiBackend, OpenAICompatibleBackend, StubBackend)
+}
+
+
+def validate_backend(name):
+    """llm_backend設定の検証（不正な場合は理由を返す）"""
+    if name not in BACKENDS:
+        return f"{sorted(BACKENDS)} のいずれかである必要があります"
+    return None
+
+
+def create_backend(config):
+    """設定からバックエンドを作成"""
+    return BACKENDS[config.llm_backend](
+        model=config.llm_model,
+        api_key=config.llm_api_key,
+        base_url=config.llm_base_url,
+        timeout=config.llm_timeout_seconds,
+        batch_size=config.llm_batch_size,
+    )
+
+
+def run_request(backend, request):
+    """1件の分析リクエストを実行（失敗時はNone）
+
+    request は {'analysis_type', 'prompt', 'issues'} のdict。
+    """
+    analysis_type = request['analysis_type']
+    started = time.perf_counter()
+    try:
+        text = backend.complete(request['prompt'], request.get('issues'))
+    except AnalyzerError as e:
+        print(f"LLM API エラー ({backend.name}, {analysis_type}): {e}", file=sys.stderr, flush=True)
+        return None
+    except Exception as e:
+        print(f"LLM分析エラー ({backend.name}, {analysis_type}): {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        return None
+
+    elapsed = time.perf_counter() - started
+    print(f"LLM分析完了 ({analysis_type}, {backend.name}, {elapsed:.1f}秒)", file=sys.stderr, flush=True)
+    return {
+        'analysis_type': analysis_type,
+        'timestamp': datetime.datetime.now().isoformat(),
+        'backend': backend.name,
+        'elapsed_seconds': round(elapsed, 3),
+        'prompt': request['prompt'],
+        'result': text,
+        'status': 'success'
+    }
+
+
+def run_requests(backend, requests, max_calls=None):
+    """分析リクエストをバックエンドのbatch_size件ずつ並行して実行
+
+    max_calls を超える分は実行しない。戻り値は成功した分析結果（リクエスト順）。
+    """
+    reason = backend.unavailable_reason()
+    if reason:
+        print(reason, file=sys.stderr, flush=True)
+        return []
+
+    if max_calls is not None and len(requests) > max_calls:
+        print(f"LLM呼び出し上限により{len(requests) - max_calls}件の分析を省略します", file=sys.stderr, flush=True)
+        requests = requests[:max_calls]
+    if not requests:
+        return []
+
+    try:
+        if backend.batch_size <= 1 or len(requests) == 1:
+            results = [run_request(backend, request) for request in requests]
+        else:
+            with ThreadPoolExecutor(max_workers=min(backend.batch_size, len(requests))) as executor:
+                results = list(executor.map(lambda request: run_request(backend, request), requests))
+    finally:
+        backend.close()
+    return [result for result in results if result]
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import sys
+from pathlib import Path
+
+from rules import extract_attributes, device_key, iter_devices, evaluate_device, severity_rank
+from storage import write_json_atomic, read_json
+
+# デバイスごとの前回状態（再起動後も差分検出を継続するために保存）
+STATE_FILE = Path('data/device_state.json')
+
+# 変化イベントの保存先（月ディレクトリごとに追記）
+EVENTS_NAME = 'events.jsonl'
+
+# NVMe自己診断結果のうち失敗を表す値（5: 致命的エラー, 6: 不明なセグメントで失敗, 7: セグメント失敗）
+_NVME_SELF_TEST_FAILURES = (5, 6, 7)
+
+
+def self_test_failure(device_data):
+    """自己診断ログ中の失敗のうち最も新しいものの電源投入時間（失敗なしはNone）"""
+    latest = None
+    ata_log = device_data.get('ata_smart_self_test_log', {}).get('standard', {})
+    for entry in ata_log.get('table', []) if isinstance(ata_log, dict) else []:
+        if isinstance(entry, dict) and entry.get('status', {}).get('passed') is False:
+            hours = entry.get('lifetime_hours', 0)
+            latest = hours if latest is None else max(latest, hours)
+
+    nvme_log = device_data.get('nvme_self_test_log', {})
+    for entry in nvme_log.get('table', []) if isinstance(nvme_log, dict) else []:
+        if isinstance(entry, dict) and entry.get('self_test_result', {}).get('value') in _NVME_SELF_TEST_FAILURES:
+            hours = entry.get('power_on_hours', 0)
+            latest = hours if latest is None else max(latest, hours)
+    return latest
+
+
+def device_state(device_data):
+    """差分検出に必要な項目だけを残したデバイス状態"""
+    return {
+        'timestamp': device_data.get('_collection_timestamp'),
+        'attributes': extract_attributes(device_data),
+        'smart_passed': device_data.get('smart_status', {}).get('passed'),
+        'self_test_failure': self_test_failure(device_data),
+    }
+
+
+def _event(device_data, timestamp, attribute, severity, value, delta, message):
+    """変化イベント（問題点と同じ項目＋メッセージ）"""
+    return {
+        'timestamp': timestamp,
+        'device': device_data.get('_device_path'),
+        'serial': device_data.get('serial_number'),
+        'model': device_data.get('model_name'),
+        'attribute': attribute,
+        'severity': severity,
+        'value': value,
+        'delta': delta,
+        'source': 'change',
+        'message': message,
+    }
+
+
+def diff_device(previous, current, device_data, rules):
+    """前回状態と今回状態の差分から変化イベントを作成（属性数に比例した計算量）
+
+    - 閾値に増加量の指定がある属性（エラー系カウンタ）: 増加したら通知（閾値未満はnotice）
+    - 値の閾値のみの属性（温度など）: 重要度が前回より上がった場合のみ通知
+    - SMART総合判定の失敗、自己診断の新しい失敗
+    """
+    events = []
+    timestamp = current['timestamp'] or datetime.datetime.now().isoformat()
+    previous_attrs = previous['attributes']
+    current_attrs = current['attributes']
+
+    current_levels = {name: severity for name, severity, _, _ in evaluate_device(current_attrs, previous_attrs, rules)}
+    previous_levels = {name: severity for name, severity, _, _ in evaluate_device(previous_attrs, None, rules)}
+
+    for name, rule in rules.items():
+        value = current_attrs.get(name)
+        old = previous_attrs.get(name)
+        if value is None or old is None:
+            continue
+        delta = value - old
+        severity = current_levels.get(name)
+        if delta > 0 and ('warning_delta' in rule or 'critical_delta' in rule):
+            events.append(_event(device_data, timestamp, name, severity or 'notice', value, delta,
+                                 f"{name} {delta:+} ({old} → {value})"))
+        elif severity and severity_rank(severity) > severity_rank(previous_levels.get(name)):
+            events.append(_event(device_data, timestamp, name, severity, value, delta,
+                                 f"{name} {value} ({severity}に上昇)"))
+
+    if current['smart_passed'] is False and previous.get('smart_passed') is not False:
+        events.append(_event(device_data, timestamp, 'smart_status', 'critical', False, None,
+                             "SMART総合判定が失敗になりました"))
+
+    failure = current['self_test_failure']
+    previous_failure = previous.get('self_test_failure')
+    if failure is not None and (previous_failure is None or failure > previous_failure):
+        events.append(_event(device_data, timestamp, 'self_test', 'critical', failure, None,
+                             f"自己診断の新しい失敗（電源投入 {failure} 時間）"))
+    return events
+
+
+class DeviceStateTracker:
+    """デバイスごとの前回状態をメモリに保持し、収集のたびに差分を検出する"""
+
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = Path(state_file)
+        self.states = None
+        self.mtime = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.state_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """初回、または他プロセス（cli.py collect など）が更新した場合のみ読み直す"""
+        mtime = self._file_mtime()
+        if self.states is None or mtime != self.mtime:
+            states = read_json(self.state_file, {})
+            self.states = states if isinstance(states, dict) else {}
+            self.mtime = mtime
+
+    def update(self, snapshot, rules):
+        """今回の収集結果で状態を更新し、変化イベントのリストを返す
+
+        初めて見るデバイスは基準とするだけでイベントは出さない。
+        """
+        self._load()
+        events = []
+        for device_data in iter_devices(snapshot):
+            key = device_key(device_data)
+            current = device_state(device_data)
+            previous = self.states.get(key)
+            if previous is not None:
+                events.extend(diff_device(previous, current, device_data, rules))
+            self.states[key] = current
+
+        write_json_atomic(self.state_file, self.states)
+        self.mtime = self._file_mtime()
+        return events
+
+
+_tracker = None
+
+
+def track_changes(snapshot, rules):
+    """常駐プロセス共通のトラッカーで変化を検出"""
+    global _tracker
+    if _tracker is None:
+        _tracker = DeviceStateTracker()
+    return _tracker.update(snapshot, rules)
+
+
+def save_events(events, data_dir='data/smart'):
+    """変化イベントを月ディレクトリの events.jsonl に追記"""
+    if not events:
+        return None
+    now = datetime.datetime.now()
+    month_dir = Path(data_dir) / f"{now.year:04d}-{now.month:02d}"
+    month_dir.mkdir(parents=True, exist_ok=True)
+    path = month_dir / EVENTS_NAME
+    with open(path, 'a', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False))
+            f.write('\n')
+    return str(path)
+
+
+def load_events(since=None, data_dir='data/smart'):
+    """since（datetime）以降の変化イベントを時刻順に読み込む"""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return []
+
+    month_from = f"{since.year:04d}-{since.month:02d}" if since else None
+    since_text = since.isoformat() if since else None
+    events = []
+    for month_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        if month_from and month_dir.name < month_from:
+            continue
+        path = month_dir / EVENTS_NAME
+        if not path.exists():
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError as e:
+                    print(f"変化イベント読み込みエラー {path}: {repr(e)}", file=sys.stderr, flush=True)
+                    continue
+                if since_text and str(event.get('timestamp', '')) < since_text:
+                    continue
+                events.append(event)
+    events.sort(key=lambda event: str(event.get('timestamp', '')))
+    return events
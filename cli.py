@@ -4,28 +4,23 @@
 import sys
 import argparse
 import json
+import datetime
 import traceback
 from pathlib import Path
 
-# main.pyから必要な関数をインポート
-try:
-    from main import (
-        collect_smart_data, 
-        analyze_data, 
-        load_config,
-        load_historical_data,
-        get_devices,
-        get_smart_data
-    )
-except ImportError as e:
-    print(f"main.pyからのインポートエラー: {repr(e)}", file=sys.stderr, flush=True)
-    sys.exit(101)
+# main.py（requests等を読み込む）は起動を軽くするため各コマンドの中で必要な時だけインポートする
 
 def cli_collect():
     """即時SMART取得"""
+    from main import collect_smart_data, load_config
+    from alert import dispatch_pending
+    
     try:
+        load_config()
         print("SMART情報を収集中...", file=sys.stderr, flush=True)
         result = collect_smart_data()
+        # 収集時に検出した変化のアラートを、常駐プロセスが停止中でも送信
+        dispatch_pending()
         if result:
             print(json.dumps({"status": "success", "message": "SMART収集完了", "devices": len(result)}, ensure_ascii=False))
         else:
@@ -39,9 +34,15 @@ def cli_collect():
 
 def cli_analyze():
     """即時分析実行"""
+    from main import analyze_data, load_config
+    from alert import dispatch_pending
+    
     try:
+        load_config()
         print("分析を実行中...", file=sys.stderr, flush=True)
         analyze_data()
+        # 常駐プロセスが停止中でも通知されるよう、登録済みアラートをここで送信
+        dispatch_pending()
         print(json.dumps({"status": "success", "message": "分析完了"}, ensure_ascii=False))
     except Exception as e:
         print(f"分析エラー: {repr(e)}", file=sys.stderr, flush=True)
@@ -49,37 +50,43 @@ def cli_analyze():
         print(json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False))
         sys.exit(104)
 
+def _config_readable():
+    """settings.json がJSONとして読み込めるか（存在しない・壊れている場合はFalse）"""
+    from storage import read_json
+    try:
+        return isinstance(read_json('settings.json'), dict)
+    except (OSError, ValueError):
+        return False
+
 def cli_status():
-    """システム状態表示"""
+    """システム状態表示（常駐プロセスが書き出した要約ファイルを読むだけ）"""
     try:
-        # 設定確認
-        config = load_config()
-        
-        # デバイス確認
-        devices = get_devices()
+        from latest_status import read_status
         
-        # 最新データ確認
-        latest_data = load_historical_data()
-        
-        # 最新のタイムスタンプを取得
-        last_collection = None
-        if latest_data:
-            first_data = latest_data[0]
-            if isinstance(first_data, list) and len(first_data) > 0:
-                # リストの場合は最初のデバイスのタイムスタンプを取得
-                last_collection = first_data[0].get('_collection_timestamp') if isinstance(first_data[0], dict) else None
-            elif isinstance(first_data, dict):
-                # 辞書の場合は直接タイムスタンプを取得
-                last_collection = first_data.get('_collection_timestamp')
+        summary = read_status() or {}
+        collection = summary.get('collection') or {}
+        analysis = summary.get('analysis') or {}
+        devices = collection.get('devices') or {}
         
         status_info = {
             "status": "success",
-            "config_loaded": True,
+            "config_loaded": _config_readable(),
             "devices_count": len(devices),
-            "devices": devices,
-            "latest_data_count": len(latest_data) if latest_data else 0,
-            "last_collection": last_collection
+            "devices": list(devices),
+            "last_collection": collection.get('timestamp'),
+            "last_collection_events": collection.get('events_count', 0),
+            "device_health": {path: info.get('health') for path, info in devices.items()},
+            "last_analysis": analysis.get('timestamp'),
+            "last_analysis_severity": analysis.get('severity'),
+            "last_analysis_counts": {
+                "analyses": analysis.get('analyses_count', 0),
+                "issues": analysis.get('issues_count', 0),
+                "by_severity": analysis.get('by_severity', {})
+            },
+            "summary_updated_at": summary.get('updated_at')
         }
+        if not summary:
+            status_info["message"] = "状態要約がまだ作成されていません（収集後に作成されます）"
         
         print(json.dumps(status_info, ensure_ascii=False, indent=2))
     except Exception as e:
@@ -90,6 +97,8 @@ def cli_status():
 
 def cli_test_device(device_path):
     """指定デバイスのテスト"""
+    from main import get_smart_data
+    
     try:
         print(f"デバイステスト中: {device_path}", file=sys.stderr, flush=True)
         smart_data = get_smart_data(device_path)
@@ -121,6 +130,8 @@ def cli_test_device(device_path):
 
 def cli_history(days):
     """履歴データ表示"""
+    from main import load_historical_data
+    
     try:
         print(f"過去{days}日間の履歴を取得中...", file=sys.stderr, flush=True)
         historical_data = load_historical_data(days_back=days)
@@ -215,6 +226,95 @@ def cli_prompt(analysis_type):
         print(json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False))
         sys.exit(108)
 
+def cli_replay(date_from, date_to, config_paths, workers, no_prompt, llm_stub):
+    """過去データのリプレイ"""
+    try:
+        from config import CONFIG_PATH, read_config_file
+        from replay import run_replay
+
+        configs = [(path, read_config_file(path)) for path in (config_paths or [CONFIG_PATH])]
+        print(f"リプレイ実行中: {date_from or '最初'} 〜 {date_to or '最後'} (設定{len(configs)}件)", file=sys.stderr, flush=True)
+        result = run_replay(
+            parse_date(date_from), parse_date(date_to), configs,
+            workers=workers, prompts=not no_prompt, llm_stub=llm_stub
+        )
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(f"リプレイエラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        print(json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False))
+        sys.exit(111)
+
+def cli_export(date_from, date_to, devices, attrs, output_format, output_path):
+    """属性履歴のストリーミング出力"""
+    try:
+        from export import iter_attribute_rows, write_rows
+
+        device_set = set(devices) if devices else None
+        attr_set = {a.strip() for a in attrs.split(',') if a.strip()} if attrs else None
+        rows = iter_attribute_rows(parse_date(date_from), parse_date(date_to), device_set, attr_set)
+
+        if output_path:
+            with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                count = write_rows(rows, f, output_format)
+        else:
+            count = write_rows(rows, sys.stdout, output_format)
+            sys.stdout.flush()
+        print(f"エクスポート完了: {count}行", file=sys.stderr, flush=True)
+    except BrokenPipeError:
+        # headなどで出力先が閉じられた場合は静かに終了
+        sys.stderr.close()
+        sys.exit(0)
+    except Exception as e:
+        print(f"エクスポートエラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(112)
+
+def cli_cohort(input_paths, compare_paths):
+    """同型ドライブ間の外れ値検出（複数ホストのスナップショットを集約可能）"""
+    try:
+        from config import load_config_or_exit
+        from cohort import analyze_cohorts
+        from storage import latest_snapshot_file
+        
+        config = load_config_or_exit()
+        
+        if not input_paths:
+            # 指定がなければ最新のスナップショットを使う
+            latest = latest_snapshot_file()
+            if latest is None:
+                print(json.dumps({"status": "error", "message": "スナップショットが見つかりません"}, ensure_ascii=False))
+                sys.exit(113)
+            input_paths = [str(latest[1])]
+        
+        def load(paths):
+            snapshots = []
+            for path in paths or []:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            return snapshots
+        
+        result = analyze_cohorts(
+            load(input_paths),
+            load(compare_paths) or None,
+            z_threshold=config.cohort_z_threshold,
+            min_size=config.cohort_min_size,
+            degrading_fraction=config.cohort_degrading_fraction
+        )
+        result = dict({"status": "success", "inputs": input_paths, "compare": compare_paths or []}, **result)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(f"コホート分析エラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        print(json.dumps({"status": "error", "message": str(e)}, ensure_ascii=False))
+        sys.exit(114)
+
+def parse_date(text):
+    """YYYY-MM-DD形式の日付を変換（未指定はNone）"""
+    if not text:
+        return None
+    return datetime.date.fromisoformat(text)
+
 def main():
     """メイン処理"""
     parser = argparse.ArgumentParser(description='SMART監視システム CLI補助ツール')
@@ -243,6 +343,29 @@ def main():
     prompt_parser = subparsers.add_parser('prompt', help='最新分析のプロンプト表示')
     prompt_parser.add_argument('--analysis-type', type=str, default='current', help='表示する分析タイプ (current/daily/weekly/monthly)')
     
+    # replay サブコマンド
+    replay_parser = subparsers.add_parser('replay', help='過去データを分析パイプラインで再生')
+    replay_parser.add_argument('--from', dest='date_from', help='開始日 (YYYY-MM-DD)')
+    replay_parser.add_argument('--to', dest='date_to', help='終了日 (YYYY-MM-DD)')
+    replay_parser.add_argument('--config', action='append', help='比較する設定ファイル（複数指定可、デフォルト: settings.json）')
+    replay_parser.add_argument('--workers', type=int, default=None, help='並列プロセス数 (デフォルト: CPU数)')
+    replay_parser.add_argument('--no-prompt', action='store_true', help='プロンプト作成を省略')
+    replay_parser.add_argument('--llm-stub', action='store_true', help='LLMの代わりにスタブ回答を使用')
+    
+    # export サブコマンド
+    export_parser = subparsers.add_parser('export', help='属性履歴のエクスポート')
+    export_parser.add_argument('--from', dest='date_from', help='開始日 (YYYY-MM-DD)')
+    export_parser.add_argument('--to', dest='date_to', help='終了日 (YYYY-MM-DD)')
+    export_parser.add_argument('--device', action='append', help='対象デバイス（パスまたはシリアル、複数指定可）')
+    export_parser.add_argument('--attrs', help='出力する属性名（カンマ区切り）')
+    export_parser.add_argument('--format', dest='output_format', choices=['jsonl', 'csv', 'tsv'], default='jsonl', help='出力形式 (デフォルト: jsonl)')
+    export_parser.add_argument('--output', help='出力ファイル (デフォルト: 標準出力)')
+    
+    # cohort サブコマンド
+    cohort_parser = subparsers.add_parser('cohort', help='同型ドライブ間の外れ値検出')
+    cohort_parser.add_argument('--input', action='append', help='分析するスナップショットJSON（複数ホスト分を複数指定可、デフォルト: 最新）')
+    cohort_parser.add_argument('--compare', action='append', help='集団劣化判定の比較用スナップショットJSON（複数指定可）')
+    
     # 旧形式のオプション（後方互換性）
     parser.add_argument('--collect', action='store_true', help='即時SMART収集')
     parser.add_argument('--analyze', action='store_true', help='即時分析実行')
@@ -263,6 +386,12 @@ def main():
             cli_history(args.days)
         elif args.command == 'prompt':
             cli_prompt(args.analysis_type)
+        elif args.command == 'export':
+            cli_export(args.date_from, args.date_to, args.device, args.attrs, args.output_format, args.output)
+        elif args.command == 'cohort':
+            cli_cohort(args.input, args.compare)
+        elif args.command == 'replay':
+            cli_replay(args.date_from, args.date_to, args.config, args.workers, args.no_prompt, args.llm_stub)
         
         # 旧形式のオプション処理（後方互換性）
         elif args.collect:
@@ -274,6 +403,9 @@ def main():
             parser.print_help()
             sys.exit(108)
             
+    except ImportError as e:
+        print(f"main.pyからのインポートエラー: {repr(e)}", file=sys.stderr, flush=True)
+        sys.exit(101)
     except KeyboardInterrupt:
         print("\\n処理が中断されました", file=sys.stderr, flush=True)
         sys.exit(109)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+
+from rules import extract_attributes, device_key, iter_devices
+
+# 同型ドライブ間で比較する属性（いずれも値が大きいほど悪い）
+COHORT_ATTRIBUTES = (
+    'Reallocated_Sector_Ct',
+    'Current_Pending_Sector',
+    'Offline_Uncorrectable',
+    'Reported_Uncorrect',
+    'Reallocated_Event_Count',
+    'UDMA_CRC_Error_Count',
+    'Spin_Retry_Count',
+    'Command_Timeout',
+    'Load_Cycle_Count',
+    'Temperature_Celsius',
+    # NVMe
+    'media_errors',
+    'num_err_log_entries',
+    'percentage_used',
+    'temperature',
+)
+
+# 集団全体の劣化を判定する属性（通常運用では増えないエラー系カウンタのみ）
+DEGRADATION_ATTRIBUTES = (
+    'Reallocated_Sector_Ct',
+    'Current_Pending_Sector',
+    'Offline_Uncorrectable',
+    'Reported_Uncorrect',
+    'Reallocated_Event_Count',
+    'media_errors',
+)
+
+# 修正Zスコアの係数（正規分布でMADを標準偏差相当に換算）
+_MAD_SCALE = 0.6745
+# MADが0の場合に平均絶対偏差で代用する際の係数
+_MEANAD_SCALE = 0.7979
+
+# ばらつき（標準偏差相当）の下限: 同型がほぼ同じ値のとき、わずかな差が外れ値にならないようにする
+#   属性ごとの絶対値（指定なしはカウンタとして1）と、中央値に対する割合の大きい方を使う
+MIN_DEVIATION = {
+    'Temperature_Celsius': 3,
+    'temperature': 3,
+    'Load_Cycle_Count': 100,
+    'percentage_used': 5,
+}
+MIN_RELATIVE_DEVIATION = 0.05
+
+_numpy_warned = False
+
+
+def _numpy():
+    """numpyを必要な時点で読み込む（未インストールならNone）"""
+    global _numpy_warned
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        if not _numpy_warned:
+            print("numpyがインストールされていないためコホート分析をスキップします（pip install numpy）", file=sys.stderr, flush=True)
+            _numpy_warned = True
+        return None
+
+
+def cohort_key(device_data):
+    """コホート（モデル＋ファームウェア）のキー"""
+    return (device_data.get('model_name') or 'unknown', device_data.get('firmware_version') or 'unknown')
+
+
+def group_devices(snapshots):
+    """複数スナップショット（複数ホスト可）のデバイスをコホートごとにまとめる
+
+    同一シリアルが複数回現れた場合は後のものを使う。
+    """
+    devices = {}
+    for snapshot in snapshots:
+        for device_data in iter_devices(snapshot):
+            devices[device_key(device_data)] = device_data
+
+    cohorts = {}
+    for key, device_data in devices.items():
+        cohorts.setdefault(cohort_key(device_data), []).append((key, device_data))
+    return cohorts
+
+
+def attribute_matrix(np, attribute_rows, attributes):
+    """属性dictのリストから デバイス×属性 の行列を作成（欠損はNaN）"""
+    matrix = np.full((len(attribute_rows), len(attributes)), np.nan)
+    index = {name: column for column, name in enumerate(attributes)}
+    for row, attrs in enumerate(attribute_rows):
+        for name, value in attrs.items():
+            column = index.get(name)
+            if column is not None:
+                matrix[row, column] = value
+    return matrix
+
+
+def deviation_floor(np, attributes, median):
+    """列ごとのばらつきの下限（MIN_DEVIATION と中央値に対する割合の大きい方）"""
+    absolute = np.array([MIN_DEVIATION.get(name, 1) for name in attributes], dtype=float)
+    return np.maximum(absolute, MIN_RELATIVE_DEVIATION * np.abs(np.nan_to_num(median)))
+
+
+def robust_statistics(np, matrix, attributes=None):
+    """列ごとの中央値・MAD・修正Zスコア・パーセンタイル順位を一括計算
+
+    attributes（列の属性名）を渡した場合は、ばらつきに deviation_floor の下限を適用する。
+    """
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    present = counts > 0
+
+    median = np.full(matrix.shape[1], np.nan)
+    mad = np.full(matrix.shape[1], np.nan)
+    mean_ad = np.full(matrix.shape[1], np.nan)
+    if present.any():
+        median[present] = np.nanmedian(matrix[:, present], axis=0)
+        deviation = np.abs(matrix - median)
+        mad[present] = np.nanmedian(deviation[:, present], axis=0)
+        mean_ad[present] = np.nanmean(deviation[:, present], axis=0)
+
+    # MADが0の列（大半のドライブが同じ値）は平均絶対偏差で代用する
+    spread = np.where(mad > 0, mad / _MAD_SCALE, mean_ad / _MEANAD_SCALE)
+    if attributes is not None:
+        spread = np.fmax(spread, deviation_floor(np, attributes, median))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(spread > 0, (matrix - median) / spread, 0.0)
+    z = np.where(valid, z, np.nan)
+
+    # パーセンタイル順位: 列番号と値の順位を1つの整数キーにまとめ、searchsortedで一括計算
+    rows, columns = matrix.shape
+    _, dense = np.unique(np.where(valid, matrix, np.inf), return_inverse=True)
+    dense = dense.reshape(rows, columns)
+    span = dense.max() + 1 if dense.size else 1
+    keys = np.arange(columns) * span + dense
+    sorted_keys = np.sort(keys[valid])
+    column_start = np.searchsorted(sorted_keys, np.arange(columns) * span, side='left')
+    less = np.searchsorted(sorted_keys, keys, side='left') - column_start
+    equal = np.searchsorted(sorted_keys, keys, side='right') - np.searchsorted(sorted_keys, keys, side='left')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentile = 100.0 * (less + 0.5 * (equal - 1)) / (counts - 1)
+    percentile = np.where(counts > 1, percentile, 50.0)
+    percentile = np.where(valid, percentile, np.nan)
+
+    return {'median': median, 'mad': mad, 'z': z, 'percentile': percentile, 'counts': counts}
+
+
+def _round(value):
+    """JSON出力用に丸める（NaN/無限大はNone）"""
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    return round(float(value), 3)
+
+
+def analyze_cohorts(snapshots, comparison_snapshots=None, z_threshold=3.5, min_size=3, degrading_fraction=0.5):
+    """同型ドライブ集団の中での外れ値と、集団全体の劣化を検出
+
+    snapshots は1ホスト分または複数ホスト分のスナップショットのリスト。
+    comparison_snapshots を渡した場合は、コホートの多数のドライブで同じ属性が増加していないかも判定する。
+    戻り値は {'cohorts': [...], 'issues': [...]}。
+    """
+    result = {'cohorts': [], 'issues': []}
+    np = _numpy()
+    if np is None:
+        return result
+
+    previous = {}
+    for snapshot in comparison_snapshots or []:
+        for device_data in iter_devices(snapshot):
+            previous[device_key(device_data)] = extract_attributes(device_data)
+
+    for (model, firmware), members in sorted(group_devices(snapshots).items()):
+        cohort_name = f"{model}/{firmware}"
+        summary = {'model': model, 'firmware': firmware, 'size': len(members), 'outliers': 0}
+        result['cohorts'].append(summary)
+        if len(members) < min_size:
+            summary['skipped'] = f"{min_size}台未満"
+            continue
+
+        attribute_rows = [extract_attributes(device_data) for _, device_data in members]
+        attributes = [name for name in COHORT_ATTRIBUTES if any(name in attrs for attrs in attribute_rows)]
+        if not attributes:
+            continue
+        matrix = attribute_matrix(np, attribute_rows, attributes)
+        stats = robust_statistics(np, matrix, attributes)
+        summary['median'] = {name: _round(stats['median'][column]) for column, name in enumerate(attributes)}
+
+        # 値が大きい側の外れ値のみを問題とする
+        flagged = np.argwhere(stats['z'] >= z_threshold)
+        for row, column in flagged:
+            key, device_data = members[row]
+            z = float(stats['z'][row, column])
+            result['issues'].append({
+                'device': device_data.get('_device_path'),
+                'serial': device_data.get('serial_number'),
+                'model': model,
+                'attribute': f"cohort:{attributes[column]}",
+                # 同型内での相対評価のため、絶対的な危険度は閾値判定に任せて警告止まりとする
+                'severity': 'warning',
+                'value': _round(matrix[row, column]),
+                'delta': _round(matrix[row, column] - stats['median'][column]),
+                'source': 'cohort',
+                'cohort': cohort_name,
+                'z': _round(z),
+                'percentile': _round(stats['percentile'][row, column]),
+            })
+        summary['outliers'] = int(len(flagged))
+
+        # 集団全体の劣化: 比較データからの増加がコホートの一定割合以上で同時に起きている属性
+        if previous:
+            previous_matrix = attribute_matrix(np, [previous.get(key, {}) for key, _ in members], attributes)
+            delta = matrix - previous_matrix
+            comparable = ~np.isnan(delta)
+            increased = np.where(comparable, delta > 0, False).sum(axis=0)
+            compared = comparable.sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fraction = np.where(compared >= min_size, increased / compared, 0.0)
+            for column in np.flatnonzero(fraction >= degrading_fraction):
+                if attributes[column] not in DEGRADATION_ATTRIBUTES:
+                    continue
+                result['issues'].append({
+                    'device': f"cohort:{cohort_name}",
+                    'serial': None,
+                    'model': model,
+                    'attribute': f"cohort_degrading:{attributes[column]}",
+                    'severity': 'warning',
+                    'value': int(increased[column]),
+                    'delta': _round(np.nanmedian(delta[:, column])),
+                    'source': 'cohort',
+                    'cohort': cohort_name,
+                    'fraction': _round(fraction[column]),
+                })
+
+    return result
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import threading
+import traceback
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from rules import validate_rules
+from analyzer import validate_backend
+
+CONFIG_PATH = 'settings.json'
+
+
+class ConfigError(Exception):
+    """設定ファイルの読み込み・検証エラー"""
+
+
+@dataclass(frozen=True)
+class Config:
+    """検証済みの設定値"""
+    collection_interval_hours: float = 1
+    analysis_interval_hours: float = 24
+    data_retention_years: float = 2
+    device_wait_seconds: float = 3
+    llm_api_key: str = ""
+    llm_model: str = "gemini-pro"
+    llm_max_calls: int = 32
+    llm_backend: str = "gemini"
+    llm_base_url: str = ""
+    llm_timeout_seconds: float = 0
+    llm_batch_size: int = 0
+    alert_command: Optional[str] = None
+    error_command: Optional[str] = None
+    alert_command_timeout_seconds: float = 30
+    alert_webhook_url: Optional[str] = None
+    alert_webhook_timeout_seconds: float = 10
+    alert_suppress_hours: float = 24
+    alert_retry_seconds: float = 60
+    alert_max_attempts: int = 5
+    alert_rules: dict = field(default_factory=dict)
+    cohort_z_threshold: float = 3.5
+    cohort_min_size: int = 3
+    cohort_degrading_fraction: float = 0.5
+
+
+# 項目ごとの検証ルール: (許可する型, 最小値)
+_SCHEMA = {
+    'collection_interval_hours': ((int, float), 0.01),
+    'analysis_interval_hours': ((int, float), 0.01),
+    'data_retention_years': ((int, float), 0.01),
+    'device_wait_seconds': ((int, float), 0),
+    'llm_api_key': ((str,), None),
+    'llm_model': ((str,), None),
+    'llm_max_calls': ((int,), 0),
+    'llm_backend': ((str,), None),
+    'llm_base_url': ((str,), None),
+    'llm_timeout_seconds': ((int, float), 0),
+    'llm_batch_size': ((int,), 0),
+    'alert_command': ((str, type(None)), None),
+    'error_command': ((str, type(None)), None),
+    'alert_command_timeout_seconds': ((int, float), 1),
+    'alert_webhook_url': ((str, type(None)), None),
+    'alert_webhook_timeout_seconds': ((int, float), 1),
+    'alert_suppress_hours': ((int, float), 0),
+    'alert_retry_seconds': ((int, float), 1),
+    'alert_max_attempts': ((int,), 1),
+    'alert_rules': ((dict,), None),
+    'cohort_z_threshold': ((int, float), 0.1),
+    'cohort_min_size': ((int,), 2),
+    'cohort_degrading_fraction': ((int, float), 0.01),
+}
+
+# 入れ子構造を持つ項目の追加検証（不正な場合は理由を返す関数）
+_VALIDATORS = {
+    'alert_rules': validate_rules,
+    'llm_backend': validate_backend,
+}
+
+
+def parse_config(raw):
+    """dictを検証してConfigを生成する（不正な場合はConfigError）"""
+    if not isinstance(raw, dict):
+        raise ConfigError("設定のトップレベルはオブジェクトである必要があります")
+
+    known = {f.name for f in fields(Config)}
+    unknown = sorted(set(raw) - known)
+    if unknown:
+        print(f"未知の設定項目を無視します: {unknown}", file=sys.stderr, flush=True)
+
+    values = {}
+    for name in known:
+        if name not in raw:
+            continue
+        value = raw[name]
+        types, minimum = _SCHEMA[name]
+        # boolはintのサブクラスなので明示的に除外
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise ConfigError(f"{name} の型が不正です: {value!r}")
+        if minimum is not None and value < minimum:
+            raise ConfigError(f"{name} は {minimum} 以上である必要があります: {value!r}")
+        if name in _VALIDATORS:
+            reason = _VALIDATORS[name](value)
+            if reason:
+                raise ConfigError(f"{name} が不正です: {reason}")
+        values[name] = value
+
+    return Config(**values)
+
+
+def read_config_file(path=CONFIG_PATH):
+    """設定ファイルを読み込んで検証する"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path}の形式が不正です: {repr(e)}") from e
+    return parse_config(raw)
+
+
+# 設定ファイルの確認に失敗している状態を表すmtimeの番兵
+_STAT_FAILED = object()
+
+
+class ConfigManager:
+    """設定のキャッシュと更新監視（mtime）"""
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._config = None
+        self._mtime = None
+
+    def _stat_mtime(self):
+        return os.stat(self.path).st_mtime_ns
+
+    def load(self):
+        """初回読み込み（失敗時は例外をそのまま送出）"""
+        with self._lock:
+            mtime = self._stat_mtime()
+            self._config = read_config_file(self.path)
+            self._mtime = mtime
+            return self._config
+
+    def get(self):
+        """現在有効な設定を返す（未読み込みなら読み込む）"""
+        config = self._config
+        if config is None:
+            config = self.load()
+        return config
+
+    def reload_if_changed(self):
+        """ファイルが更新されていれば再読み込みする
+
+        不正な内容の場合は直前の有効な設定を維持する。
+        設定が差し替わった場合はTrueを返す。
+        """
+        try:
+            mtime = self._stat_mtime()
+        except OSError as e:
+            # 確認できない状態が続く間は最初の1回だけ記録する（無効な内容の場合と同様）
+            if self._mtime is not _STAT_FAILED:
+                self._mtime = _STAT_FAILED
+                print(f"設定ファイル確認エラー（現在の設定を維持）: {repr(e)}", file=sys.stderr, flush=True)
+            return False
+
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            try:
+                new_config = read_config_file(self.path)
+            except Exception as e:
+                # 同じ内容で何度もエラーを出さないよう、mtimeだけは更新する
+                self._mtime = mtime
+                print(f"設定変更を拒否しました（現在の設定を維持）: {repr(e)}", file=sys.stderr, flush=True)
+                return False
+
+            old_config = self._config
+            self._config = new_config
+            self._mtime = mtime
+
+        if old_config is not None and old_config != new_config:
+            changed = [f.name for f in fields(Config)
+                       if getattr(old_config, f.name) != getattr(new_config, f.name)]
+            print(f"設定を再読み込みしました: {changed}", file=sys.stderr, flush=True)
+            return True
+        return False
+
+
+_manager = ConfigManager()
+
+
+def get_config():
+    """現在有効な設定を取得"""
+    return _manager.get()
+
+
+def reload_config():
+    """設定ファイルの更新を確認して反映"""
+    return _manager.reload_if_changed()
+
+
+def load_config_or_exit():
+    """起動時の設定読み込み（失敗時は終了コードを返して終了）"""
+    try:
+        return _manager.get()
+    except FileNotFoundError:
+        print("settings.jsonが見つかりません。settings.json.templateからコピーしてください。", file=sys.stderr, flush=True)
+        sys.exit(101)
+    except ConfigError as e:
+        print(f"settings.jsonの内容が不正です: {e}", file=sys.stderr, flush=True)
+        sys.exit(102)
+    except Exception as e:
+        print(f"設定ファイル読み込みエラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(103)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import sys
+
+from rules import iter_devices, parse_raw_value
+from storage import iter_snapshot_files
+
+# 出力列（全形式共通）
+EXPORT_FIELDS = (
+    'timestamp', 'device', 'serial', 'model', 'attribute',
+    'value', 'worst', 'thresh', 'raw_value', 'raw_string',
+)
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'tsv')
+
+
+def iter_snapshots(date_from=None, date_to=None, data_dir='data/smart'):
+    """スナップショットを時刻順に1件ずつ読み込んで返す"""
+    for collected, path in iter_snapshot_files(date_from, date_to, data_dir):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            print(f"エクスポート読み込みエラー {path}: {repr(e)}", file=sys.stderr, flush=True)
+            continue
+        yield collected, snapshot
+
+
+def _device_rows(device_data, timestamp, attrs):
+    """1デバイス分の属性行を作成（attrs指定時はその属性のみ）"""
+    base = {
+        'timestamp': device_data.get('_collection_timestamp') or timestamp,
+        'device': device_data.get('_device_path'),
+        'serial': device_data.get('serial_number'),
+        'model': device_data.get('model_name'),
+    }
+
+    table = device_data.get('ata_smart_attributes', {}).get('table', [])
+    for attr in table:
+        if not isinstance(attr, dict):
+            continue
+        name = attr.get('name')
+        if attrs is not None and name not in attrs:
+            continue
+        raw = attr.get('raw', {}) if isinstance(attr.get('raw'), dict) else {}
+        yield dict(base, attribute=name, value=attr.get('value'), worst=attr.get('worst'),
+                   thresh=attr.get('thresh'), raw_value=parse_raw_value(attr),
+                   raw_string=raw.get('string'))
+
+    nvme_log = device_data.get('nvme_smart_health_information_log', {})
+    if isinstance(nvme_log, dict):
+        for name, value in nvme_log.items():
+            if attrs is not None and name not in attrs:
+                continue
+            if isinstance(value, list):
+                value = ' '.join(str(v) for v in value)
+            yield dict(base, attribute=name, value=None, worst=None, thresh=None,
+                       raw_value=value, raw_string=str(value))
+
+
+def iter_attribute_rows(date_from=None, date_to=None, devices=None, attrs=None, data_dir='data/smart'):
+    """指定期間の属性行をスナップショット単位で順次生成
+
+    devices はデバイスパスまたはシリアルの集合、attrs は属性名の集合（Noneは全件）。
+    メモリ上に保持するのは常に1スナップショット分のみ。
+    """
+    for collected, snapshot in iter_snapshots(date_from, date_to, data_dir):
+        timestamp = collected.isoformat()
+        for device_data in iter_devices(snapshot):
+            if devices is not None and not (
+                    device_data.get('_device_path') in devices or device_data.get('serial_number') in devices):
+                continue
+            yield from _device_rows(device_data, timestamp, attrs)
+
+
+def write_rows(rows, out, output_format):
+    """行を指定形式で順次書き出す（書き出した行数を返す）"""
+    count = 0
+    if output_format == 'jsonl':
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False))
+            out.write('\n')
+            count += 1
+        return count
+
+    delimiter = '\t' if output_format == 'tsv' else ','
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, delimiter=delimiter, lineterminator='\n')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import sys
+from pathlib import Path
+
+from storage import write_json_atomic, read_json
+
+# 常駐プロセスが更新し、cli.py status が読むだけの要約ファイル
+STATUS_FILE = Path('data/latest_status.json')
+
+
+def update_status(section, summary):
+    """要約ファイルの指定セクションを置き換える（アトミックに差し替え）"""
+    try:
+        status = read_json(STATUS_FILE, {})
+        if not isinstance(status, dict):
+            status = {}
+        status[section] = summary
+        status['updated_at'] = datetime.datetime.now().isoformat()
+        write_json_atomic(STATUS_FILE, status, indent=2)
+    except Exception as e:
+        print(f"状態要約の更新エラー: {repr(e)}", file=sys.stderr, flush=True)
+
+
+def read_status():
+    """要約ファイルを読み込む（未作成ならNone）"""
+    return read_json(STATUS_FILE)
@@ -8,27 +8,21 @@ import time
 import subprocess
 import datetime
 import traceback
-import requests
 from pathlib import Path
 
+from config import get_config, reload_config, load_config_or_exit
+from rules import merge_rules, evaluate_rules, issues_from_analyses, severity_rank
+from alert import submit_alerts, start_dispatcher
+from latest_status import update_status, read_status
+from cohort import analyze_cohorts
+from changes import track_changes, save_events, load_events
+from analyzer import create_backend, run_requests
+from storage import select_comparison_files
+
 # 設定読み込み
 def load_config():
-    """設定ファイルを読み込む"""
-    try:
-        with open('settings.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        return config
-    except FileNotFoundError:
-        print("settings.jsonが見つかりません。settings.json.templateからコピーしてください。", file=sys.stderr, flush=True)
-        sys.exit(101)
-    except json.JSONDecodeError as e:
-        print(f"settings.jsonの形式が不正です: {repr(e)}", file=sys.stderr, flush=True)
-        traceback.print_exc(file=sys.stderr)
-        sys.exit(102)
-    except Exception as e:
-        print(f"設定ファイル読み込みエラー: {repr(e)}", file=sys.stderr, flush=True)
-        traceback.print_exc(file=sys.stderr)
-        sys.exit(103)
+    """設定ファイルを読み込む（初回のみ解析し、以降は検証済みのキャッシュを返す）"""
+    return load_config_or_exit()
 
 # デバイス管理
 def get_devices():
@@ -118,6 +112,15 @@ def save_data(data):
         traceback.print_exc(file=sys.stderr)
         return None
 
+def load_snapshot(path):
+    """スナップショットを1件読み込む（失敗時はNone）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"スナップショット読み込みエラー {path}: {repr(e)}", file=sys.stderr, flush=True)
+        return None
+
 def load_historical_data(days_back=None):
     """過去データ読み込み"""
     try:
@@ -194,74 +197,28 @@ def convert_to_tsv(smart_data):
         return ""
 
 # LLM分析
-def analyze_with_llm(current_data, comparison_data=None, analysis_type="current"):
-    """Gemini API呼び出しによる分析"""
-    try:
-        config = load_config()
-        api_key = config.get('llm_api_key')
-        model = config.get('llm_model', 'gemini-pro')
-        
-        if not api_key or api_key == "YOUR_GEMINI_API_KEY":
-            print("LLM APIキーが設定されていません", file=sys.stderr, flush=True)
-            return None
-        
-        # プロンプト作成
-        if analysis_type == "current":
-            prompt = create_analysis_prompt(current_data, None, "現在のSMART値を分析してください。")
-        elif analysis_type == "daily":
-            prompt = create_analysis_prompt(current_data, comparison_data, "1日前との比較でSMART値を分析してください。")
-        elif analysis_type == "weekly":
-            prompt = create_analysis_prompt(current_data, comparison_data, "1週間前との比較でSMART値を分析してください。")
-        elif analysis_type == "monthly":
-            prompt = create_analysis_prompt(current_data, comparison_data, "1ヶ月前との比較でSMART値を分析してください。")
-        else:
-            prompt = create_analysis_prompt(current_data, comparison_data, "SMART値を分析してください。")
-        
-        # Gemini API呼び出し
-        headers = {
-            'Content-Type': 'application/json',
-        }
-        
-        url = f'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}'
-        
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }]
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if 'candidates' in result and len(result['candidates']) > 0:
-                text = result['candidates'][0]['content']['parts'][0]['text']
-                print(f"LLM分析完了 ({analysis_type})", file=sys.stderr, flush=True)
-                return {
-                    'analysis_type': analysis_type,
-                    'timestamp': datetime.datetime.now().isoformat(),
-                    'prompt': prompt,
-                    'result': text,
-                    'status': 'success'
-                }
-            else:
-                print(f"LLM応答が空です: {result}", file=sys.stderr, flush=True)
-                return None
-        else:
-            print(f"LLM API エラー: {response.status_code}, {response.text}", file=sys.stderr, flush=True)
-            return None
-            
-    except requests.RequestException as e:
-        print(f"LLM API リクエストエラー: {repr(e)}", file=sys.stderr, flush=True)
-        return None
-    except Exception as e:
-        print(f"LLM分析エラー: {repr(e)}", file=sys.stderr, flush=True)
-        traceback.print_exc(file=sys.stderr)
-        return None
+ANALYSIS_INSTRUCTIONS = {
+    "current": "現在のSMART値を分析してください。",
+    "daily": "1日前との比較でSMART値を分析してください。",
+    "weekly": "1週間前との比較でSMART値を分析してください。",
+    "monthly": "1ヶ月前との比較でSMART値を分析してください。",
+}
+
+def build_prompt(current_data, comparison_data, analysis_type, events=None):
+    """分析タイプに応じたプロンプト作成"""
+    instruction = ANALYSIS_INSTRUCTIONS.get(analysis_type, "SMART値を分析してください。")
+    if analysis_type == "current":
+        comparison_data = None
+    return create_analysis_prompt(current_data, comparison_data, instruction, events)
+
+def format_events(events):
+    """変化イベントをプロンプト用の行に変換"""
+    return "\n".join(
+        f"{event.get('timestamp')}\t{event.get('device')}\t{event.get('severity')}\t{event.get('message')}"
+        for event in events
+    )
 
-def create_analysis_prompt(current_data, comparison_data, instruction):
+def create_analysis_prompt(current_data, comparison_data, instruction, events=None):
     """分析用プロンプト作成"""
     try:
         prompt = f"""
@@ -277,6 +234,12 @@ def create_analysis_prompt(current_data, comparison_data, instruction):
             prompt += f"""
 比較用SMART情報（TSV形式）:
 {convert_to_tsv(comparison_data)}
+"""
+        
+        if events:
+            prompt += f"""
+前回分析以降に収集時に検出された変化（時刻・デバイス・重要度・内容）:
+{format_events(events)}
 """
         
         prompt += """
@@ -312,90 +275,93 @@ def create_analysis_prompt(current_data, comparison_data, instruction):
 def analyze_data():
     """分析処理（4パターン）"""
     try:
-        # 最新データを取得
-        latest_data = load_historical_data()
-        if not latest_data:
+        # 最新データと比較対象（1日前/1週間前/1ヶ月前）をファイル名の収集時刻で選ぶ
+        selected = select_comparison_files()
+        current_data = load_snapshot(selected[0][1]) if selected else None
+        if not current_data:
             print("分析対象データがありません", file=sys.stderr, flush=True)
             return
-        
-        current_data = latest_data[0]  # 最新データ
+        _, comparison_files = selected
         
         # 4種類の分析を実行
         analyses = []
         
+        # 閾値による判定（LLMとは独立して実施）
+        rules = merge_rules(get_config().alert_rules)
+        rule_issues = evaluate_rules(current_data, None, rules)
+        # コホート分析での集団劣化判定に使う比較データ（見つかった中で最も古いもの）
+        cohort_comparison = None
+        # 前回分析以降に収集時に検出された変化（履歴の再走査は不要）
+        events = load_events(last_analysis_time())
+        
+        # LLMへの分析リクエスト（プロンプトを先に全て作成し、まとめてバックエンドに送る）
         # 1. 現在の状態分析
-        result1 = analyze_with_llm(current_data, None, "current")
-        if result1:
-            analyses.append(result1)
-        
-        # 2. 1日前との比較
-        daily_data = load_historical_data(days_back=2)
-        if len(daily_data) >= 2:
-            result2 = analyze_with_llm(current_data, daily_data[1], "daily")
-            if result2:
-                analyses.append(result2)
-        
-        # 3. 1週間前との比較
-        weekly_data = load_historical_data(days_back=8)
-        if len(weekly_data) >= 2:
-            # 約1週間前のデータを探す
-            week_old = None
-            for data in weekly_data:
-                # データがリストの場合は最初の要素を使用
-                if isinstance(data, list) and len(data) > 0:
-                    data_item = data[0]
-                else:
-                    data_item = data
-                
-                if isinstance(data_item, dict):
-                    timestamp = data_item.get('_collection_timestamp', '')
-                    if timestamp:
-                        try:
-                            data_time = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                            if data_time < datetime.datetime.now() - datetime.timedelta(days=6):
-                                week_old = data
-                                break
-                        except:
-                            continue
-            
-            if week_old:
-                result3 = analyze_with_llm(current_data, week_old, "weekly")
-                if result3:
-                    analyses.append(result3)
-        
-        # 4. 1ヶ月前との比較
-        monthly_data = load_historical_data(days_back=35)
-        if len(monthly_data) >= 2:
-            # 約1ヶ月前のデータを探す
-            month_old = None
-            for data in monthly_data:
-                # データがリストの場合は最初の要素を使用
-                if isinstance(data, list) and len(data) > 0:
-                    data_item = data[0]
-                else:
-                    data_item = data
-                
-                if isinstance(data_item, dict):
-                    timestamp = data_item.get('_collection_timestamp', '')
-                    if timestamp:
-                        try:
-                            data_time = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                            if data_time < datetime.datetime.now() - datetime.timedelta(days=28):
-                                month_old = data
-                                break
-                        except:
-                            continue
-            
-            if month_old:
-                result4 = analyze_with_llm(current_data, month_old, "monthly")
-                if result4:
-                    analyses.append(result4)
+        llm_requests = [{
+            'analysis_type': "current",
+            'prompt': build_prompt(current_data, None, "current", events),
+            'issues': list(rule_issues)
+        }]
+        
+        # 2〜4. 1日前/1週間前/1ヶ月前との比較
+        for analysis_type, path in comparison_files.items():
+            comparison_data = load_snapshot(path) if path else None
+            if not comparison_data:
+                continue
+            comparison_issues = evaluate_rules(current_data, comparison_data, rules, analysis_type)
+            rule_issues.extend(comparison_issues)
+            cohort_comparison = comparison_data
+            llm_requests.append({
+                'analysis_type': analysis_type,
+                'prompt': build_prompt(current_data, comparison_data, analysis_type),
+                'issues': comparison_issues
+            })
+        
+        config = get_config()
+        analyses.extend(run_requests(create_backend(config), llm_requests, config.llm_max_calls))
+        
+        if events:
+            analyses.append({
+                'analysis_type': 'changes',
+                'timestamp': datetime.datetime.now().isoformat(),
+                'events': events,
+                'status': 'success'
+            })
+        
+        if rule_issues:
+            analyses.append({
+                'analysis_type': 'rules',
+                'timestamp': datetime.datetime.now().isoformat(),
+                'issues': rule_issues,
+                'status': 'success'
+            })
+        
+        # 同型ドライブ（モデル＋ファームウェア）間の比較
+        cohort_result = analyze_cohorts(
+            [current_data],
+            [cohort_comparison] if cohort_comparison else None,
+            z_threshold=config.cohort_z_threshold,
+            min_size=config.cohort_min_size,
+            degrading_fraction=config.cohort_degrading_fraction
+        )
+        if cohort_result['cohorts']:
+            analyses.append({
+                'analysis_type': 'cohort',
+                'timestamp': datetime.datetime.now().isoformat(),
+                'cohorts': cohort_result['cohorts'],
+                'issues': cohort_result['issues'],
+                'status': 'success'
+            })
+        issues = rule_issues + cohort_result['issues']
         
         # 分析結果を保存
         if analyses:
             save_analysis_results(analyses)
-            # アラート判定
-            check_for_alerts(analyses)
+        
+        # アラート判定
+        check_for_alerts(analyses, issues)
+        
+        # 状態要約を更新
+        update_status('analysis', summarize_analysis(analyses, issues))
         
         print(f"分析完了: {len(analyses)}件", file=sys.stderr, flush=True)
         
@@ -403,6 +369,64 @@ def analyze_data():
         print(f"分析処理エラー: {repr(e)}", file=sys.stderr, flush=True)
         traceback.print_exc(file=sys.stderr)
 
+def max_severity(issues):
+    """問題点の最大重要度（問題なしは'ok'）"""
+    severity = 'ok'
+    for issue in issues:
+        if severity == 'ok' or severity_rank(issue['severity']) > severity_rank(severity):
+            severity = issue['severity']
+    return severity
+
+def last_analysis_time():
+    """前回分析の時刻（状態要約から取得、未実施なら分析間隔分さかのぼった時刻）"""
+    try:
+        timestamp = (read_status() or {}).get('analysis', {}).get('timestamp')
+        if timestamp:
+            return datetime.datetime.fromisoformat(timestamp)
+    except Exception as e:
+        print(f"前回分析時刻の取得エラー: {repr(e)}", file=sys.stderr, flush=True)
+    return datetime.datetime.now() - datetime.timedelta(hours=get_config().analysis_interval_hours)
+
+def summarize_analysis(analyses, rule_issues):
+    """分析結果の要約（cli.py status 用）"""
+    issues = list(rule_issues) + issues_from_analyses(analyses)
+    by_severity = {}
+    for issue in issues:
+        by_severity[issue['severity']] = by_severity.get(issue['severity'], 0) + 1
+    return {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'severity': max_severity(issues),
+        'analyses_count': len([a for a in analyses if a.get('analysis_type') not in ('rules', 'cohort', 'changes')]),
+        'issues_count': len(issues),
+        'by_severity': by_severity
+    }
+
+def summarize_collection(all_data, filename, config, events=None):
+    """収集結果の要約（デバイスごとの健全性、cli.py status 用）"""
+    rules = merge_rules(config.alert_rules)
+    devices = {}
+    for device_data in all_data:
+        issues = evaluate_rules(device_data, None, rules)
+        health = max_severity(issues)
+        smart_passed = device_data.get('smart_status', {}).get('passed')
+        if smart_passed is False:
+            health = 'critical'
+        devices[device_data.get('_device_path', 'unknown')] = {
+            'serial': device_data.get('serial_number'),
+            'model': device_data.get('model_name'),
+            'health': health,
+            'smart_passed': smart_passed,
+            'temperature': device_data.get('temperature', {}).get('current'),
+            'issues': [issue['attribute'] for issue in issues]
+        }
+    return {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'file': filename,
+        'devices_count': len(devices),
+        'devices': devices,
+        'events_count': len(events or [])
+    }
+
 def save_analysis_results(analyses):
     """分析結果の保存"""
     try:
@@ -420,36 +444,38 @@ def save_analysis_results(analyses):
     except Exception as e:
         print(f"分析結果保存エラー: {repr(e)}", file=sys.stderr, flush=True)
 
-def check_for_alerts(analyses):
-    """アラート判定"""
+def check_for_alerts(analyses, rule_issues=None):
+    """アラート判定（キューへの登録のみ行い、送信はバックグラウンドで実施）"""
     try:
-        config = load_config()
-        alert_command = config.get('alert_command')
-        
-        # 危険または警告レベルをチェック
-        alert_triggered = False
-        for analysis in analyses:
-            result_text = analysis.get('result', '').lower()
-            if '危険' in result_text or '警告' in result_text or 'critical' in result_text or 'warning' in result_text:
-                alert_triggered = True
-                break
-        
-        if alert_triggered and alert_command:
-            try:
-                # アラートコマンド実行
-                subprocess.run(['bash', alert_command], timeout=30)
-                print("アラート通知実行", file=sys.stderr, flush=True)
-            except Exception as e:
-                print(f"アラート実行エラー: {repr(e)}", file=sys.stderr, flush=True)
-    
+        # LLM回答は「状態」行の判定結果のみを使う（本文中の単語には反応しない）
+        issues = list(rule_issues or []) + issues_from_analyses(analyses)
+        # 分析時は全問題の一覧が揃うため、検出されなくなった問題は解消済みとする
+        submit_alerts(issues, resolve=True)
     except Exception as e:
         print(f"アラート判定エラー: {repr(e)}", file=sys.stderr, flush=True)
 
+def detect_changes(all_data, config):
+    """前回収集からの変化を検出し、保存・アラート登録する"""
+    try:
+        events = track_changes(all_data, merge_rules(config.alert_rules))
+        if not events:
+            return []
+        for event in events:
+            print(f"変化検出: {event['device']} {event['message']} ({event['severity']})", file=sys.stderr, flush=True)
+        save_events(events)
+        # 収集時は変化分のみのため、検出されなかった問題を解消済みにはしない
+        submit_alerts(events)
+        return events
+    except Exception as e:
+        print(f"変化検出エラー: {repr(e)}", file=sys.stderr, flush=True)
+        traceback.print_exc(file=sys.stderr)
+        return []
+
 # メイン処理
 def collect_smart_data():
     """SMART情報収集処理"""
     try:
-        config = load_config()
+        config = get_config()
         devices = get_devices()
         
         if not devices:
@@ -462,11 +488,13 @@ def collect_smart_data():
             smart_data = get_smart_data(device)
             if smart_data:
                 all_data.append(smart_data)
-            time.sleep(config.get('device_wait_seconds', 3))
+            time.sleep(config.device_wait_seconds)
         
         if all_data:
             filename = save_data(all_data)
             print(f"データ保存完了: {filename}", file=sys.stderr, flush=True)
+            events = detect_changes(all_data, config)
+            update_status('collection', summarize_collection(all_data, filename, config, events))
             return all_data
         else:
             print("SMART データが取得できませんでした", file=sys.stderr, flush=True)
@@ -479,8 +507,8 @@ def collect_smart_data():
 def cleanup_old_data():
     """古いデータの削除"""
     try:
-        config = load_config()
-        retention_years = config.get('data_retention_years', 2)
+        config = get_config()
+        retention_years = config.data_retention_years
         cutoff_date = datetime.datetime.now() - datetime.timedelta(days=retention_years * 365)
         
         data_dir = Path('data/smart')
@@ -500,7 +528,7 @@ def cleanup_old_data():
                         
                         if dir_date < cutoff_date:
                             # ディレクトリ内のファイルを削除
-                            for file_path in month_dir.glob('*.json'):
+                            for file_path in list(month_dir.glob('*.json')) + list(month_dir.glob('*.jsonl')):
                                 file_path.unlink()
                                 deleted_count += 1
                             # 空のディレクトリを削除
@@ -518,9 +546,8 @@ def cleanup_old_data():
 def main_loop():
     """定期実行メインループ"""
     try:
-        config = load_config()
-        collection_interval = config.get('collection_interval_hours', 1) * 3600
-        analysis_interval = config.get('analysis_interval_hours', 24) * 3600
+        load_config()
+        start_dispatcher()
         
         last_collection = 0
         last_analysis = 0
@@ -529,6 +556,12 @@ def main_loop():
         
         while True:
             try:
+                # 設定ファイルの変更を反映（不正な変更は拒否され直前の設定を維持）
+                reload_config()
+                config = get_config()
+                collection_interval = config.collection_interval_hours * 3600
+                analysis_interval = config.analysis_interval_hours * 3600
+                
                 current_time = time.time()
                 
                 # データ収集
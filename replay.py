@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzer import StubBackend
+from alert import alert_key, collapse_issues, should_alert, resolve_missing
+from cohort import analyze_cohorts
+from rules import (
+    merge_rules, evaluate_rules, issues_from_analyses, iter_devices
+)
+from storage import iter_snapshot_files, COMPARISONS, COMPARISON_LOOKBACK, find_comparison
+
+# 比較データとして保持する期間（シャード境界の助走期間も兼ねる）
+LOOKBACK = COMPARISON_LOOKBACK
+
+STAGES = ('load', 'extract', 'rules', 'cohort', 'prompt', 'llm')
+
+
+def compact_snapshot(snapshot):
+    """判定・コホート分析・プロンプト作成に必要な項目だけを残したスナップショットを作成"""
+    compact = []
+    for device_data in iter_devices(snapshot):
+        table = device_data.get('ata_smart_attributes', {}).get('table', [])
+        entry = {
+            '_device_path': device_data.get('_device_path'),
+            '_collection_timestamp': device_data.get('_collection_timestamp'),
+            'serial_number': device_data.get('serial_number'),
+            'model_name': device_data.get('model_name'),
+            'firmware_version': device_data.get('firmware_version'),
+            'ata_smart_attributes': {'table': [
+                {'name': attr.get('name'), 'raw': attr.get('raw', {})}
+                for attr in table if isinstance(attr, dict)
+            ]},
+        }
+        if 'nvme_smart_health_information_log' in device_data:
+            entry['nvme_smart_health_information_log'] = device_data['nvme_smart_health_information_log']
+        compact.append(entry)
+    return compact
+
+
+def replay_shard(task):
+    """1シャード分のスナップショットを時刻順に分析パイプラインへ流す（ワーカープロセスで実行）"""
+    timings = {stage: 0.0 for stage in STAGES}
+    analyses_done = []
+    snapshots = 0
+
+    build_prompt = None
+    stub = StubBackend()
+    if task['prompts']:
+        from main import build_prompt
+
+    emit_from = datetime.datetime.fromisoformat(task['emit_from']) if task['emit_from'] else None
+    history = deque()
+    last_slots = [None] * len(task['configs'])
+
+    for collected_text, path in task['files']:
+        collected = datetime.datetime.fromisoformat(collected_text)
+
+        started = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            print(f"リプレイ読み込みエラー {path}: {repr(e)}", file=sys.stderr, flush=True)
+            continue
+        timings['load'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        current = compact_snapshot(snapshot)
+        del snapshot
+        while history and collected - history[0][0] > LOOKBACK:
+            history.popleft()
+        comparisons = {'current': None}
+        for analysis_type, min_age, max_age in COMPARISONS:
+            comparisons[analysis_type] = find_comparison(history, collected, min_age, max_age)
+        # コホート分析での集団劣化判定には見つかった中で最も古い比較データを使う（analyze_data と同じ）
+        cohort_comparison = None
+        for comparison in comparisons.values():
+            if comparison is not None:
+                cohort_comparison = comparison
+        history.append((collected, current))
+        timings['extract'] += time.perf_counter() - started
+
+        # 助走期間（比較データの準備のみ）
+        if emit_from is not None and collected < emit_from:
+            for index, config in enumerate(task['configs']):
+                last_slots[index] = int(collected.timestamp() // config['analysis_interval_seconds'])
+            continue
+        snapshots += 1
+
+        prompts_built = False
+        for index, config in enumerate(task['configs']):
+            # 分析は analysis_interval_hours ごとの区切りで最初のスナップショットに対して行う
+            slot = int(collected.timestamp() // config['analysis_interval_seconds'])
+            if slot == last_slots[index]:
+                continue
+            last_slots[index] = slot
+
+            # 分析タイプごとの判定結果（スタブLLMには analyze_data と同様にそのタイプの分だけを渡す）
+            started = time.perf_counter()
+            type_issues = {'current': evaluate_rules(current, None, config['rules'])}
+            for analysis_type, comparison in comparisons.items():
+                if analysis_type != 'current' and comparison is not None:
+                    type_issues[analysis_type] = evaluate_rules(current, comparison, config['rules'], analysis_type)
+            issues = [issue for found in type_issues.values() for issue in found]
+            timings['rules'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            cohort_result = analyze_cohorts(
+                [current],
+                [cohort_comparison] if cohort_comparison is not None else None,
+                z_threshold=config['cohort_z_threshold'],
+                min_size=config['cohort_min_size'],
+                degrading_fraction=config['cohort_degrading_fraction']
+            )
+            timings['cohort'] += time.perf_counter() - started
+
+            # プロンプトは設定に依存しないためスナップショットごとに一度だけ作成
+            if build_prompt is not None and not prompts_built:
+                started = time.perf_counter()
+                for analysis_type, comparison in comparisons.items():
+                    if analysis_type == 'current' or comparison is not None:
+                        build_prompt(current, comparison, analysis_type)
+                prompts_built = True
+                timings['prompt'] += time.perf_counter() - started
+
+            if task['llm_stub']:
+                started = time.perf_counter()
+                analyses = [
+                    {'analysis_type': analysis_type, 'result': stub.complete(None, found)}
+                    for analysis_type, found in type_issues.items()
+                ]
+                issues.extend(issues_from_analyses(analyses))
+                timings['llm'] += time.perf_counter() - started
+
+            issues.extend(cohort_result['issues'])
+
+            analyses_done.append((collected_text, index, issues))
+
+    return {
+        'snapshots': snapshots,
+        'timings': timings,
+        'analyses': analyses_done,
+    }
+
+
+def plan_tasks(files, emit_from, workers, base_task):
+    """スナップショット一覧を期間で区切ってワーカー用のタスクに分割
+
+    各シャードには比較用の助走期間（直前35日分）を含める。
+    """
+    emit_files = [entry for entry in files if emit_from is None or entry[0] >= emit_from]
+    if not emit_files:
+        return []
+    chunk = -(-len(emit_files) // workers)
+    tasks = []
+    for start in range(0, len(emit_files), chunk):
+        shard_start = emit_files[start][0]
+        shard_end = emit_files[min(start + chunk, len(emit_files)) - 1][0]
+        warmup_start = datetime.datetime.fromisoformat(shard_start) - LOOKBACK
+        shard_files = [entry for entry in files
+                       if warmup_start.isoformat() <= entry[0] <= shard_end]
+        tasks.append(dict(base_task, files=shard_files, emit_from=shard_start))
+    return tasks
+
+
+def simulate_alerts(analyses, suppress_seconds):
+    """分析結果を時刻順に並べ、重複抑止を適用して実際に通知されたであろうアラートを求める
+
+    analyses は (時刻, 問題点リスト) のリスト。
+    """
+    raised = []
+    state = {}
+    for collected_text, issues in sorted(analyses, key=lambda a: a[0]):
+        now = datetime.datetime.fromisoformat(collected_text).timestamp()
+        collapsed = collapse_issues(issues)
+        resolve_missing(state, collapsed)
+        for key, issue in collapsed.items():
+            send, previous_severity = should_alert(
+                state, key, issue['severity'], now, suppress_seconds, issue.get('value'))
+            if not send:
+                continue
+            state[key] = {'severity': issue['severity'], 'value': issue.get('value'), 'last_sent': now}
+            raised.append({
+                'timestamp': collected_text,
+                'device': issue.get('device'),
+                'serial': issue.get('serial'),
+                'attribute': issue.get('attribute'),
+                'severity': issue.get('severity'),
+                'previous_severity': previous_severity,
+                'value': issue.get('value'),
+                'delta': issue.get('delta'),
+                'source': issue.get('source'),
+            })
+    return raised
+
+
+def run_replay(date_from, date_to, configs, workers=None, prompts=True, llm_stub=False):
+    """過去データを分析パイプラインで再生し、設定ごとのアラートと処理時間を集計
+
+    configs は (名前, Config) のリスト。
+    """
+    wall_started = time.perf_counter()
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    # 範囲の開始前も比較データとして読む
+    warmup_from = (datetime.datetime.combine(date_from, datetime.time()) - LOOKBACK).date() if date_from else None
+    files = [(collected.isoformat(), str(path))
+             for collected, path in iter_snapshot_files(warmup_from, date_to)]
+    emit_from = datetime.datetime.combine(date_from, datetime.time()).isoformat() if date_from else None
+
+    base_task = {
+        'configs': [{
+            'rules': merge_rules(config.alert_rules),
+            'analysis_interval_seconds': config.analysis_interval_hours * 3600,
+            'cohort_z_threshold': config.cohort_z_threshold,
+            'cohort_min_size': config.cohort_min_size,
+            'cohort_degrading_fraction': config.cohort_degrading_fraction,
+        } for _, config in configs],
+        'prompts': prompts,
+        'llm_stub': llm_stub,
+    }
+    tasks = plan_tasks(files, emit_from, workers, base_task)
+
+    results = []
+    if len(tasks) <= 1:
+        results = [replay_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(replay_shard, tasks))
+
+    timings = {stage: 0.0 for stage in STAGES}
+    per_config = [{} for _ in configs]
+    snapshots = 0
+    for result in results:
+        for stage, seconds in result['timings'].items():
+            timings[stage] += seconds
+        for collected_text, index, issues in result['analyses']:
+            per_config[index][collected_text] = issues
+        snapshots += result['snapshots']
+
+    report_configs = []
+    analyses = 0
+    for (name, config), merged in zip(configs, per_config):
+        analyses += len(merged)
+        raised = simulate_alerts(list(merged.items()), config.alert_suppress_hours * 3600)
+        by_severity = {}
+        for alert in raised:
+            by_severity[alert['severity']] = by_severity.get(alert['severity'], 0) + 1
+        report_configs.append({
+            'name': name,
+            'analyses': len(merged),
+            'issues': sum(len(issues) for issues in merged.values()),
+            'alerts_raised': len(raised),
+            'by_severity': by_severity,
+            'devices': sorted({alert_key(alert).split('|')[0] for alert in raised}),
+            'alerts': raised,
+        })
+
+    return {
+        'status': 'success',
+        'from': date_from.isoformat() if date_from else None,
+        'to': date_to.isoformat() if date_to else None,
+        'snapshots': snapshots,
+        'analyses': analyses,
+        'workers': workers,
+        'tasks': len(tasks),
+        'wall_seconds': round(time.perf_counter() - wall_started, 3),
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        'configs': report_configs,
+    }
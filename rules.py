@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+
+# 重要度（数値が大きいほど深刻）
+SEVERITY_LEVELS = {
+    'info': 0,
+    'notice': 1,
+    'warning': 2,
+    'critical': 3,
+}
+
+# LLM回答の「状態」表記と重要度の対応
+LLM_STATUS_SEVERITY = {
+    '正常': 'info',
+    '注意': 'notice',
+    '警告': 'warning',
+    '危険': 'critical',
+    'normal': 'info',
+    'caution': 'notice',
+    'warning': 'warning',
+    'critical': 'critical',
+}
+
+_LLM_STATUS_PATTERN = re.compile(
+    r'(?:状態|status)\s*[:：]\s*[\[【]?\s*(正常|注意|警告|危険|normal|caution|warning|critical)',
+    re.IGNORECASE,
+)
+
+# 属性ごとの判定閾値
+#   warning_delta / critical_delta: 比較データからの増加量
+#   warning_value / critical_value: 現在値そのもの
+DEFAULT_RULES = {
+    'Reallocated_Sector_Ct': {'warning_delta': 1, 'critical_delta': 10},
+    'Current_Pending_Sector': {'warning_delta': 1, 'critical_delta': 5},
+    'Offline_Uncorrectable': {'warning_delta': 1, 'critical_delta': 5},
+    'Reported_Uncorrect': {'warning_delta': 1, 'critical_delta': 10},
+    'Reallocated_Event_Count': {'warning_delta': 1, 'critical_delta': 10},
+    'UDMA_CRC_Error_Count': {'warning_delta': 10},
+    'Temperature_Celsius': {'warning_value': 55, 'critical_value': 65},
+    # NVMe
+    'critical_warning': {'critical_value': 1},
+    'media_errors': {'warning_delta': 1, 'critical_delta': 10},
+    'percentage_used': {'warning_value': 90, 'critical_value': 100},
+    'temperature': {'warning_value': 70, 'critical_value': 80},
+}
+
+RULE_KEYS = ('warning_delta', 'critical_delta', 'warning_value', 'critical_value')
+
+_LEADING_INT = re.compile(r'^\s*(-?\d+)')
+
+
+def severity_rank(severity):
+    """重要度を比較用の数値に変換"""
+    return SEVERITY_LEVELS.get(severity, 0)
+
+
+def merge_rules(overrides=None):
+    """既定の閾値に設定ファイルの上書きを反映"""
+    rules = {name: dict(rule) for name, rule in DEFAULT_RULES.items()}
+    for name, rule in (overrides or {}).items():
+        rules.setdefault(name, {}).update(rule)
+    return rules
+
+
+def validate_rules(rules):
+    """alert_rules設定の検証（不正な場合は理由を返す）"""
+    if not isinstance(rules, dict):
+        return "オブジェクトである必要があります"
+    for name, rule in rules.items():
+        if not isinstance(rule, dict):
+            return f"{name} はオブジェクトである必要があります"
+        for key, value in rule.items():
+            if key not in RULE_KEYS:
+                return f"{name}.{key} は未知の閾値です"
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f"{name}.{key} は数値である必要があります"
+    return None
+
+
+def parse_raw_value(attr):
+    """ATA属性のRAW値を数値化（raw.stringの先頭の整数を優先）"""
+    raw = attr.get('raw', {})
+    if not isinstance(raw, dict):
+        return None
+    match = _LEADING_INT.match(str(raw.get('string', '')))
+    if match:
+        return int(match.group(1))
+    value = raw.get('value')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def extract_attributes(device_data):
+    """デバイスのSMART情報から属性名→数値のdictを作成"""
+    attributes = {}
+    if not isinstance(device_data, dict):
+        return attributes
+
+    table = device_data.get('ata_smart_attributes', {}).get('table', [])
+    for attr in table:
+        if isinstance(attr, dict) and attr.get('name'):
+            value = parse_raw_value(attr)
+            if value is not None:
+                attributes[str(attr['name'])] = value
+
+    nvme_log = device_data.get('nvme_smart_health_information_log', {})
+    if isinstance(nvme_log, dict):
+        for name, value in nvme_log.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                attributes[name] = value
+
+    return attributes
+
+
+def device_key(device_data):
+    """デバイスの識別キー（シリアル優先、なければデバイスパス）"""
+    return device_data.get('serial_number') or device_data.get('_device_path') or 'unknown'
+
+
+def iter_devices(snapshot):
+    """スナップショット（リストまたは単一dict）からデバイス情報を列挙"""
+    if isinstance(snapshot, list):
+        for device_data in snapshot:
+            if isinstance(device_data, dict):
+                yield device_data
+    elif isinstance(snapshot, dict):
+        yield snapshot
+
+
+def evaluate_device(current_attrs, previous_attrs, rules):
+    """1デバイス分の属性を閾値判定（属性数に比例した計算量）
+
+    戻り値は (属性名, 重要度, 現在値, 増加量) のリスト。
+    """
+    results = []
+    for name, rule in rules.items():
+        value = current_attrs.get(name)
+        if value is None:
+            continue
+
+        delta = None
+        if previous_attrs is not None and previous_attrs.get(name) is not None:
+            delta = value - previous_attrs[name]
+
+        severity = None
+        if 'critical_value' in rule and value >= rule['critical_value']:
+            severity = 'critical'
+        elif delta is not None and 'critical_delta' in rule and delta >= rule['critical_delta']:
+            severity = 'critical'
+        elif 'warning_value' in rule and value >= rule['warning_value']:
+            severity = 'warning'
+        elif delta is not None and 'warning_delta' in rule and delta >= rule['warning_delta']:
+            severity = 'warning'
+
+        if severity:
+            results.append((name, severity, value, delta))
+    return results
+
+
+def evaluate_rules(current_data, comparison_data=None, rules=None, comparison_label=None):
+    """スナップショット同士を比較して問題点（issue）のリストを作成"""
+    if rules is None:
+        rules = DEFAULT_RULES
+
+    previous = {}
+    for device_data in iter_devices(comparison_data):
+        previous[device_key(device_data)] = extract_attributes(device_data)
+
+    issues = []
+    for device_data in iter_devices(current_data):
+        key = device_key(device_data)
+        for name, severity, value, delta in evaluate_device(
+                extract_attributes(device_data), previous.get(key), rules):
+            # 比較データありの判定では増加分のみを問題とし、絶対値判定の重複を避ける
+            if comparison_data is not None and delta is None:
+                continue
+            issues.append({
+                'device': device_data.get('_device_path'),
+                'serial': device_data.get('serial_number'),
+                'model': device_data.get('model_name'),
+                'attribute': name,
+                'severity': severity,
+                'value': value,
+                'delta': delta,
+                'source': f"rule_{comparison_label}" if comparison_label else 'rule',
+            })
+    return issues
+
+
+def parse_llm_severity(text):
+    """LLM回答の「状態: [...]」行から重要度を取得（見つからなければNone）"""
+    if not text:
+        return None
+    match = _LLM_STATUS_PATTERN.search(text)
+    if not match:
+        return None
+    return LLM_STATUS_SEVERITY.get(match.group(1).lower(), LLM_STATUS_SEVERITY.get(match.group(1)))
+
+
+def issues_from_analyses(analyses):
+    """LLM分析結果から問題点（issue）を作成"""
+    issues = []
+    for analysis in analyses:
+        severity = parse_llm_severity(analysis.get('result', ''))
+        if severity is None or severity_rank(severity) < severity_rank('warning'):
+            continue
+        issues.append({
+            'device': None,
+            'serial': None,
+            'model': None,
+            'attribute': f"llm_{analysis.get('analysis_type', 'unknown')}",
+            'severity': severity,
+            'value': None,
+            'delta': None,
+            'source': 'llm',
+        })
+    return issues
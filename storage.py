@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+from pathlib import Path
+
+
+def write_json_atomic(path, data, indent=None):
+    """JSONを一時ファイル経由で書き込み、rename で置き換える
+
+    読み手が書き込み途中のファイルを見ることはない。
+    """
+    # 読み込みだけの利用（cli.py status など）では不要なため書き込み時に読み込む
+    import tempfile
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path, default=None):
+    """JSONファイルを読み込む（存在しない場合はdefault）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def snapshot_time(path):
+    """smart_YYYYMMDD_HHMMSS.json のファイル名から収集時刻を取得"""
+    try:
+        return datetime.datetime.strptime(Path(path).stem[len('smart_'):], '%Y%m%d_%H%M%S')
+    except ValueError:
+        return None
+
+
+def iter_snapshot_files(date_from=None, date_to=None, data_dir='data/smart'):
+    """SMARTスナップショットを時刻の昇順で (収集時刻, パス) として列挙
+
+    date_from / date_to は datetime.date（両端を含む）。
+    範囲外の月ディレクトリは中身を列挙しない。
+    """
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return
+
+    month_from = f"{date_from.year:04d}-{date_from.month:02d}" if date_from else None
+    month_to = f"{date_to.year:04d}-{date_to.month:02d}" if date_to else None
+
+    for month_dir in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        if month_from and month_dir.name < month_from:
+            continue
+        if month_to and month_dir.name > month_to:
+            continue
+        entries = []
+        for json_file in month_dir.glob('smart_*.json'):
+            collected = snapshot_time(json_file)
+            if collected is None:
+                continue
+            if date_from and collected.date() < date_from:
+                continue
+            if date_to and collected.date() > date_to:
+                continue
+            entries.append((collected, json_file))
+        entries.sort()
+        yield from entries
+
+
+# 比較データの選択条件: (分析タイプ, 最小経過時間, 最大経過時間)
+# 分析（main.analyze_data）とリプレイで共通に使う
+COMPARISONS = (
+    ('daily', datetime.timedelta(0), datetime.timedelta(days=2)),
+    ('weekly', datetime.timedelta(days=6), datetime.timedelta(days=8)),
+    ('monthly', datetime.timedelta(days=28), datetime.timedelta(days=35)),
+)
+
+# 比較データとして参照する最も古い時点
+COMPARISON_LOOKBACK = max(max_age for _, _, max_age in COMPARISONS)
+
+
+def find_comparison(history, collected, min_age, max_age):
+    """時刻の昇順の (時刻, データ) のリストから比較対象（条件を満たす最新のもの）を探す"""
+    for past_time, past_data in reversed(history):
+        age = collected - past_time
+        if age > max_age:
+            return None
+        if age > min_age:
+            return past_data
+    return None
+
+
+def latest_snapshot_file(data_dir='data/smart'):
+    """最新のスナップショットを (収集時刻, パス) で返す（なければNone）"""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return None
+    for month_dir in sorted((p for p in data_dir.iterdir() if p.is_dir()), reverse=True):
+        entries = [(snapshot_time(path), path) for path in month_dir.glob('smart_*.json')]
+        entries = [entry for entry in entries if entry[0] is not None]
+        if entries:
+            return max(entries)
+    return None
+
+
+def select_comparison_files(data_dir='data/smart'):
+    """最新のスナップショットと、分析タイプごとの比較対象のファイルを選ぶ
+
+    ファイル名の収集時刻だけで選ぶため、中身は読み込まない。
+    戻り値は ((収集時刻, パス), {分析タイプ: パスまたはNone})、データがなければNone。
+    """
+    latest = latest_snapshot_file(data_dir)
+    if latest is None:
+        return None
+    collected, _ = latest
+    history = [entry for entry in iter_snapshot_files(
+        (collected - COMPARISON_LOOKBACK).date(), collected.date(), data_dir) if entry[0] <= collected]
+    comparisons = {
+        analysis_type: find_comparison(history, collected, min_age, max_age)
+        for analysis_type, min_age, max_age in COMPARISONS
+    }
+    return latest, comparisons
@@ -0,0 +1,420 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テストクリーンアップ
+function cleanup_test() {
+    rm -rf test_data/
+}
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム アラートテスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# 1. LLM回答の重要度判定
+echo "1. LLM回答判定テスト..." >&2
+
+LLM_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from rules import parse_llm_severity
+
+cases = [
+    ('- 状態: [警告]\n- 主な問題: 代替処理待ちセクタ増加', 'warning'),
+    ('- 状態: 危険', 'critical'),
+    ('- 状態: [正常]\n- 主な問題: no warning, no critical issue', 'info'),
+    ('特に問題なし（warningなし）', None),
+]
+for text, expected in cases:
+    actual = parse_llm_severity(text)
+    if actual != expected:
+        print(f'判定誤り: {text!r} -> {actual} (期待値 {expected})')
+        sys.exit(1)
+print(f'{len(cases)}件正しく判定')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "LLM回答判定" "PASS" "$LLM_OUTPUT"
+else
+    test_result "LLM回答判定" "FAIL" "$LLM_OUTPUT"
+fi
+
+# 2. 閾値判定
+echo "" >&2
+echo "2. 閾値判定テスト..." >&2
+
+RULE_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from rules import evaluate_rules
+
+def snapshot(pending):
+    return [{
+        '_device_path': '/dev/test',
+        'serial_number': 'TEST123',
+        'ata_smart_attributes': {'table': [
+            {'name': 'Current_Pending_Sector', 'raw': {'value': pending, 'string': str(pending)}},
+            {'name': 'Temperature_Celsius', 'raw': {'value': 193275674654, 'string': '30 (Min/Max 20/45)'}},
+        ]}
+    }]
+
+issues = evaluate_rules(snapshot(3), snapshot(0), comparison_label='daily')
+if len(issues) != 1 or issues[0]['attribute'] != 'Current_Pending_Sector' or issues[0]['delta'] != 3:
+    print(f'判定誤り: {issues}')
+    sys.exit(1)
+if evaluate_rules(snapshot(3), snapshot(3), comparison_label='daily'):
+    print('変化なしで検出されました')
+    sys.exit(1)
+print(f'検出: {issues[0][\"attribute\"]} {issues[0][\"severity\"]} delta={issues[0][\"delta\"]}')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "閾値判定" "PASS" "$RULE_OUTPUT"
+else
+    test_result "閾値判定" "FAIL" "$RULE_OUTPUT"
+fi
+
+# 3. 重複抑止・エスカレーション
+echo "" >&2
+echo "3. 重複抑止テスト..." >&2
+
+DEDUP_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from alert import should_alert
+
+key = 'TEST123|Current_Pending_Sector'
+state = {key: {'severity': 'warning', 'value': 3, 'last_sent': 1000}}
+checks = [
+    (should_alert(state, key, 'warning', 1000 + 3600, 86400, 4)[0], False),
+    (should_alert(state, key, 'critical', 1000 + 3600, 86400, 9)[0], True),
+    (should_alert(state, key, 'warning', 1000 + 86400, 86400, 3)[0], False),
+    (should_alert(state, key, 'warning', 1000 + 86400, 86400, 4)[0], True),
+    (should_alert(state, 'TEST999|Current_Pending_Sector', 'warning', 1000, 86400, 3)[0], True),
+]
+for actual, expected in checks:
+    if actual != expected:
+        print(f'判定誤り: {checks}')
+        sys.exit(1)
+print('抑止・エスカレーション判定正常')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "重複抑止" "PASS" "$DEDUP_OUTPUT"
+else
+    test_result "重複抑止" "FAIL" "$DEDUP_OUTPUT"
+fi
+
+# 4. キュー登録・送信
+echo "" >&2
+echo "4. キュー送信テスト..." >&2
+
+mkdir -p test_data
+cat > test_data/test_alert.sh << 'SCRIPT'
+#!/bin/bash
+cat > received.json
+echo "$SMART_ALERT_SEVERITY $1" > received_env.txt
+SCRIPT
+echo '{"alert_command": "./test_alert.sh", "alert_suppress_hours": 24}' > test_data/settings.json
+
+QUEUE_OUTPUT=$($PYTHON_CMD -c "
+import json
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+os.chdir('test_data')
+from alert import submit_alerts, dispatch_pending
+
+issue = {'device': '/dev/test', 'serial': 'TEST123', 'attribute': 'Current_Pending_Sector',
+         'severity': 'warning', 'value': 3, 'delta': 3, 'source': 'rule_daily'}
+if len(submit_alerts([issue, dict(issue)])) != 1:
+    print('同一問題が集約されていません')
+    sys.exit(1)
+if submit_alerts([issue]):
+    print('抑止期間中に再登録されました')
+    sys.exit(1)
+if dispatch_pending() != 1:
+    print('送信されませんでした')
+    sys.exit(1)
+with open('received.json', encoding='utf-8') as f:
+    payload = json.load(f)
+with open('received_env.txt', encoding='utf-8') as f:
+    env_line = f.read().strip()
+if payload['serial'] != 'TEST123' or payload['delta'] != 3 or env_line != 'warning /dev/test':
+    print(f'ペイロード不正: {payload} / {env_line}')
+    sys.exit(1)
+print(f'送信成功: {payload[\"message\"]}')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "キュー送信" "PASS" "$QUEUE_OUTPUT"
+else
+    test_result "キュー送信" "FAIL" "$QUEUE_OUTPUT"
+fi
+
+# 5. 送信失敗時の再試行・Webhook送信
+echo "" >&2
+echo "5. 送信失敗・再試行テスト..." >&2
+
+cat > test_data/count_alert.sh << 'SCRIPT'
+#!/bin/bash
+echo "$SMART_ALERT_ATTRIBUTE" >> command_calls.txt
+SCRIPT
+
+RETRY_OUTPUT=$($PYTHON_CMD -c "
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+sys.path.insert(0, os.getcwd())
+os.chdir('test_data')
+
+# 接続を拒否されるポート（一度確保して閉じる）
+probe = socket.socket()
+probe.bind(('127.0.0.1', 0))
+refused_port = probe.getsockname()[1]
+probe.close()
+
+def write_settings(webhook_url):
+    with open('settings.json', 'w', encoding='utf-8') as f:
+        json.dump({'alert_command': './count_alert.sh', 'alert_webhook_url': webhook_url,
+                   'alert_webhook_timeout_seconds': 1, 'alert_retry_seconds': 10,
+                   'alert_max_attempts': 3}, f)
+
+write_settings(f'http://127.0.0.1:{refused_port}/hook')
+import alert
+from config import reload_config
+from storage import read_json
+
+def queued_record():
+    files = sorted(alert.QUEUE_DIR.glob('*.json'))
+    return read_json(files[0]) if len(files) == 1 else None
+
+def command_calls():
+    with open('command_calls.txt', encoding='utf-8') as f:
+        return f.read().split()
+
+issue = {'device': '/dev/retry', 'serial': 'RETRY1', 'attribute': 'Reallocated_Sector_Ct',
+         'severity': 'critical', 'value': 20, 'delta': 20, 'source': 'rule_daily'}
+alert.submit_alerts([issue])
+now = 1000000.0
+
+# 1回目: コマンドは成功、Webhookは失敗 → 再試行待ち
+if alert.dispatch_pending(now) != 0:
+    print('失敗したのに送信完了になりました')
+    sys.exit(1)
+record = queued_record()
+if record is None or (record['attempts'], record['next_attempt'], record['delivered']) != (1, now + 10, {'command': True}):
+    print(f'1回目の状態不正: {record}')
+    sys.exit(1)
+
+# 再試行時刻前は何もしない
+alert.dispatch_pending(now + 5)
+if queued_record()['attempts'] != 1:
+    print('再試行時刻前に送信されました')
+    sys.exit(1)
+
+# 2回目: 間隔が倍になる、成功済みのコマンドは再実行しない
+alert.dispatch_pending(now + 10)
+record = queued_record()
+if record['attempts'] != 2 or record['next_attempt'] != now + 10 + 20 or command_calls() != ['Reallocated_Sector_Ct']:
+    print(f'2回目の状態不正: {record} / {command_calls()}')
+    sys.exit(1)
+
+# 3回目: 上限に達して failed/ へ移動
+alert.dispatch_pending(now + 30)
+failed = list(alert.FAILED_DIR.glob('*.json'))
+if list(alert.QUEUE_DIR.glob('*.json')) or len(failed) != 1 or read_json(failed[0])['attempts'] != 3:
+    print(f'failedへの移動不正: {failed}')
+    sys.exit(1)
+
+# Webhook受信サーバーへの送信成功
+received = []
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+server = HTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+write_settings(f'http://127.0.0.1:{server.server_address[1]}/hook')
+os.utime('settings.json', (now, now))
+reload_config()
+
+alert.submit_alerts([dict(issue, attribute='Current_Pending_Sector')])
+if alert.dispatch_pending() != 1 or len(received) != 1 or received[0]['attribute'] != 'Current_Pending_Sector':
+    print(f'Webhook送信不正: {received}')
+    sys.exit(1)
+print('指数バックオフ・チャネル単位の再送・failed移動・Webhook送信を確認')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "送信失敗・再試行" "PASS" "$RETRY_OUTPUT"
+else
+    test_result "送信失敗・再試行" "FAIL" "$RETRY_OUTPUT"
+fi
+
+# 6. 送信中の古いキューファイルを他プロセスが奪わない
+echo "" >&2
+echo "6. 処理中ロックテスト..." >&2
+
+cat > test_data/slow_alert.sh << 'SCRIPT'
+#!/bin/bash
+echo "$SMART_ALERT_ATTRIBUTE" >> slow_calls.txt
+sleep 2
+SCRIPT
+echo '{"alert_command": "./slow_alert.sh"}' > test_data/settings.json
+
+LOCK_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.getcwd())
+os.chdir('test_data')
+import alert
+
+alert.submit_alerts([{'device': '/dev/lock', 'serial': 'LOCK1', 'attribute': 'Offline_Uncorrectable',
+                      'severity': 'critical', 'value': 9, 'delta': 9, 'source': 'rule_daily'}])
+# 1時間前に登録された（再試行待ちだった）レコード
+for path in alert.QUEUE_DIR.glob('*.json'):
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+
+worker = threading.Thread(target=alert.dispatch_pending)
+worker.start()
+deadline = time.time() + 10
+while not list(alert.QUEUE_DIR.glob('*.json.lock')) and time.time() < deadline:
+    time.sleep(0.05)
+# 送信中に別プロセス（cli.py analyze など）が処理しても再送しない
+alert.dispatch_pending()
+worker.join()
+
+with open('slow_calls.txt', encoding='utf-8') as f:
+    calls = f.read().split()
+if calls != ['Offline_Uncorrectable'] or list(alert.QUEUE_DIR.iterdir()):
+    print(f'二重送信または残留: {calls} / {list(alert.QUEUE_DIR.iterdir())}')
+    sys.exit(1)
+print('送信中のロックは古いキューファイルでも奪われない')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "処理中ロック" "PASS" "$LOCK_OUTPUT"
+else
+    test_result "処理中ロック" "FAIL" "$LOCK_OUTPUT"
+fi
+
+# 7. 壊れたキューファイル・状態ファイル
+echo "" >&2
+echo "7. 破損ファイルテスト..." >&2
+
+echo '{"alert_command": "./test_alert.sh"}' > test_data/settings.json
+
+CORRUPT_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+os.chdir('test_data')
+import alert
+
+# 書き込み途中で切れたキューファイルは失敗扱いで退避し、繰り返し処理しない
+alert.QUEUE_DIR.mkdir(parents=True, exist_ok=True)
+(alert.QUEUE_DIR / 'broken.json').write_text('{\"payload\": {\"dev', encoding='utf-8')
+for _ in range(2):
+    alert.dispatch_pending()
+if list(alert.QUEUE_DIR.iterdir()) or not (alert.FAILED_DIR / 'broken.json').exists():
+    print(f'壊れたキューファイルが退避されていません: {list(alert.QUEUE_DIR.iterdir())}')
+    sys.exit(1)
+
+# 壊れた状態ファイルは空の状態から始める
+alert.STATE_FILE.write_text('{\"broken', encoding='utf-8')
+queued = alert.submit_alerts([{'device': '/dev/bad', 'serial': 'BAD1', 'attribute': 'Reallocated_Sector_Ct',
+                               'severity': 'warning', 'value': 5, 'delta': 5, 'source': 'rule_daily'}])
+if len(queued) != 1 or not isinstance(alert.read_json(alert.STATE_FILE), dict):
+    print(f'壊れた状態ファイルで登録できません: {queued}')
+    sys.exit(1)
+print('壊れたキューファイルを退避し、壊れた状態ファイルを初期化')
+" 2>&1)
+
+if [ $? -eq 0 ] && echo "$CORRUPT_OUTPUT" | grep -q "状態を初期化"; then
+    test_result "破損ファイル" "PASS" "$CORRUPT_OUTPUT"
+else
+    test_result "破損ファイル" "FAIL" "$CORRUPT_OUTPUT"
+fi
+
+# クリーンアップ
+cleanup_test
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "アラートテスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全てのアラートテストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかのアラートテストが失敗しました。" >&2
+    exit 1
+fi
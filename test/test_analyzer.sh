@@ -0,0 +1,224 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム LLMバックエンドテスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# 1. スタブバックエンド
+echo "1. スタブバックエンドテスト..." >&2
+
+STUB_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from analyzer import AnalyzerBackend, StubBackend, run_requests
+from rules import issues_from_analyses
+
+try:
+    AnalyzerBackend()
+    print('complete未実装の基底クラスが生成できました')
+    sys.exit(1)
+except TypeError:
+    pass
+
+backend = StubBackend()
+requests = [
+    {'analysis_type': 'current', 'prompt': 'p', 'issues': []},
+    {'analysis_type': 'daily', 'prompt': 'p', 'issues': [{'severity': 'critical'}]},
+]
+results = run_requests(backend, requests)
+if [r['analysis_type'] for r in results] != ['current', 'daily']:
+    print(f'結果の順序不正: {results}')
+    sys.exit(1)
+issues = issues_from_analyses(results)
+if [issue['attribute'] for issue in issues] != ['llm_daily'] or issues[0]['severity'] != 'critical':
+    print(f'スタブ回答の判定不正: {issues}')
+    sys.exit(1)
+print('閾値判定結果から決定的な回答を作成')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "スタブバックエンド" "PASS" "$STUB_OUTPUT"
+else
+    test_result "スタブバックエンド" "FAIL" "$STUB_OUTPUT"
+fi
+
+# 2. ローカルのテスト用サーバーに対するHTTPバックエンド
+echo "" >&2
+echo "2. HTTPバックエンドテスト..." >&2
+
+if ! $PYTHON_CMD -c "import requests" 2>/dev/null; then
+    test_result "HTTPバックエンド" "FAIL" "pip install requests が必要"
+else
+    HTTP_OUTPUT=$($PYTHON_CMD -c "
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, '.')
+from analyzer import GeminiBackend, OpenAICompatibleBackend, run_requests
+
+received = []
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        received.append((self.path, self.headers.get('x-goog-api-key'), body))
+        if self.path == '/v1/chat/completions':
+            result = {'choices': [{'message': {'content': '- 状態: [警告]'}}]}
+        else:
+            result = {'candidates': [{'content': {'parts': [{'text': '- 状態: [正常]'}]}}]}
+        data = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base_url = f'http://127.0.0.1:{server.server_address[1]}'
+requests = [{'analysis_type': t, 'prompt': t} for t in ('current', 'daily', 'weekly', 'monthly')]
+
+local = OpenAICompatibleBackend(model='local', base_url=base_url)
+if local.batch_size != 1 or local.timeout != 300:
+    print(f'既定値不正: batch={local.batch_size} timeout={local.timeout}')
+    sys.exit(1)
+results = run_requests(local, requests, max_calls=3)
+if len(results) != 3 or results[0]['result'] != '- 状態: [警告]' or received[0][2]['messages'][0]['content'] != 'current':
+    print(f'OpenAI互換の結果不正: {results}')
+    sys.exit(1)
+
+received.clear()
+sessions = {}
+
+class RecordingGemini(GeminiBackend):
+    def session(self):
+        session = super().session()
+        sessions.setdefault(threading.get_ident(), set()).add(id(session))
+        return session
+
+gemini = RecordingGemini(model='gemini-pro', api_key='secret', base_url=base_url, batch_size=4)
+results = run_requests(gemini, requests)
+paths = {path for path, _, _ in received}
+if len(results) != 4 or paths != {'/v1beta/models/gemini-pro:generateContent'} or received[0][1] != 'secret':
+    print(f'Gemini呼び出し不正: {received}')
+    sys.exit(1)
+# セッションはスレッドごとに1つで共有せず、終了時に全て閉じる
+session_ids = [ids for ids in sessions.values()]
+if any(len(ids) != 1 for ids in session_ids) or len(set().union(*session_ids)) != len(session_ids) or gemini._sessions:
+    print(f'セッション管理不正: {sessions}')
+    sys.exit(1)
+
+if run_requests(GeminiBackend(model='gemini-pro', api_key='YOUR_GEMINI_API_KEY', base_url=base_url), requests):
+    print('APIキー未設定で呼び出しが行われた')
+    sys.exit(1)
+print('OpenAI互換（上限3件）・Gemini（キーはヘッダー、4並列）で分析')
+" 2>/dev/null)
+
+    if [ $? -eq 0 ]; then
+        test_result "HTTPバックエンド" "PASS" "$HTTP_OUTPUT"
+    else
+        test_result "HTTPバックエンド" "FAIL" "$HTTP_OUTPUT"
+    fi
+fi
+
+# 3. 設定の検証
+echo "" >&2
+echo "3. バックエンド設定検証テスト..." >&2
+
+CONFIG_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from config import parse_config, ConfigError
+from analyzer import create_backend
+
+config = parse_config({'llm_backend': 'openai', 'llm_timeout_seconds': 20, 'llm_batch_size': 2})
+backend = create_backend(config)
+if backend.name != 'openai' or backend.timeout != 20 or backend.batch_size != 2:
+    print(f'設定の反映不正: {backend.name} {backend.timeout} {backend.batch_size}')
+    sys.exit(1)
+try:
+    parse_config({'llm_backend': 'unknown'})
+    print('未知のバックエンドが受理された')
+    sys.exit(1)
+except ConfigError as e:
+    print(f'拒否: {e}')
+" 2>/dev/null)
+
+if [ $? -eq 0 ]; then
+    test_result "バックエンド設定検証" "PASS" "$CONFIG_OUTPUT"
+else
+    test_result "バックエンド設定検証" "FAIL" "$CONFIG_OUTPUT"
+fi
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "LLMバックエンドテスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全てのLLMバックエンドテストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかのLLMバックエンドテストが失敗しました。" >&2
+    exit 1
+fi
@@ -0,0 +1,218 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム 変化検出テスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# テスト用ディレクトリ
+TEST_DIR="test_data_changes"
+
+cleanup_test() {
+    rm -rf "$TEST_DIR"
+}
+
+cleanup_test
+mkdir -p "$TEST_DIR"
+cp settings.json.template "$TEST_DIR/settings.json"
+
+# 1. 属性ごとの差分判定
+echo "1. 差分判定テスト..." >&2
+
+DIFF_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from changes import device_state, diff_device
+from rules import merge_rules
+
+def device(pending, crc, temperature, passed=True, failures=()):
+    return {
+        '_device_path': '/dev/sda',
+        'serial_number': 'S1',
+        '_collection_timestamp': '2025-01-01T00:00:00',
+        'smart_status': {'passed': passed},
+        'ata_smart_attributes': {'table': [
+            {'name': 'Current_Pending_Sector', 'raw': {'string': str(pending)}},
+            {'name': 'UDMA_CRC_Error_Count', 'raw': {'string': str(crc)}},
+            {'name': 'Temperature_Celsius', 'raw': {'string': str(temperature)}},
+        ]},
+        'ata_smart_self_test_log': {'standard': {'table': [
+            {'status': {'passed': False}, 'lifetime_hours': hours} for hours in failures
+        ]}}
+    }
+
+rules = merge_rules()
+base = device_state(device(0, 0, 40, failures=(100,)))
+
+# 変化なし・温度の揺らぎ（閾値未満）はイベントなし
+events = diff_device(base, device_state(device(0, 0, 45, failures=(100,))), device(0, 0, 45), rules)
+if events:
+    print(f'変化なしでイベント発生: {events}')
+    sys.exit(1)
+
+current = device(3, 2, 56, passed=False, failures=(100, 200))
+events = diff_device(base, device_state(current), current, rules)
+found = {event['attribute']: (event['severity'], event['delta']) for event in events}
+expected = {
+    'Current_Pending_Sector': ('warning', 3),
+    'UDMA_CRC_Error_Count': ('notice', 2),
+    'Temperature_Celsius': ('warning', 16),
+    'smart_status': ('critical', None),
+    'self_test': ('critical', None),
+}
+if found != expected:
+    print(f'イベント不正: {found}')
+    sys.exit(1)
+print('カウンタ増加・閾値超え・SMART判定・自己診断の変化を検出')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "差分判定" "PASS" "$DIFF_OUTPUT"
+else
+    test_result "差分判定" "FAIL" "$DIFF_OUTPUT"
+fi
+
+# 2. 前回状態の保存・再起動後の継続とイベント保存
+echo "" >&2
+echo "2. 状態保存・イベント保存テスト..." >&2
+
+STATE_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+os.chdir('$TEST_DIR')
+from changes import DeviceStateTracker, save_events, load_events
+from rules import merge_rules
+
+def snapshot(pending):
+    return [{
+        '_device_path': '/dev/sda',
+        'serial_number': 'S1',
+        'ata_smart_attributes': {'table': [{'name': 'Current_Pending_Sector', 'raw': {'string': str(pending)}}]}
+    }]
+
+rules = merge_rules()
+if DeviceStateTracker().update(snapshot(1), rules):
+    print('初回収集でイベント発生')
+    sys.exit(1)
+
+# 再起動相当（新しいインスタンス）でも保存済みの状態と比較する
+events = DeviceStateTracker().update(snapshot(4), rules)
+if len(events) != 1 or events[0]['delta'] != 3:
+    print(f'再起動後の差分不正: {events}')
+    sys.exit(1)
+
+save_events(events)
+loaded = load_events()
+if len(loaded) != 1 or loaded[0]['message'] != events[0]['message']:
+    print(f'イベント保存不正: {loaded}')
+    sys.exit(1)
+print(f'検出: {events[0][\"message\"]}')
+" 2>&1)
+
+if [ $? -eq 0 ] && [ -f "$TEST_DIR/data/device_state.json" ]; then
+    test_result "状態保存・イベント保存" "PASS" "$STATE_OUTPUT"
+else
+    test_result "状態保存・イベント保存" "FAIL" "$STATE_OUTPUT"
+fi
+
+# 3. 収集処理からのアラート登録
+echo "" >&2
+echo "3. 収集時アラート登録テスト..." >&2
+
+ALERT_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+os.chdir('$TEST_DIR')
+import main
+from config import get_config
+
+data = [{
+    '_device_path': '/dev/sda',
+    'serial_number': 'S1',
+    'ata_smart_attributes': {'table': [{'name': 'Current_Pending_Sector', 'raw': {'string': '9'}}]}
+}]
+events = main.detect_changes(data, get_config())
+queued = os.listdir('data/alert/queue')
+if len(events) != 1 or len(queued) != 1:
+    print(f'アラート登録不正: events={len(events)} queue={len(queued)}')
+    sys.exit(1)
+print('critical変化をアラートキューに登録')
+" 2>/dev/null)
+
+if [ $? -eq 0 ]; then
+    test_result "収集時アラート登録" "PASS" "$ALERT_OUTPUT"
+else
+    test_result "収集時アラート登録" "FAIL" "$ALERT_OUTPUT"
+fi
+
+cleanup_test
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "変化検出テスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全ての変化検出テストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかの変化検出テストが失敗しました。" >&2
+    exit 1
+fi
@@ -0,0 +1,250 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム コホート分析テスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+if ! $PYTHON_CMD -c "import numpy" 2>/dev/null; then
+    test_result "numpyパッケージ" "FAIL" "pip install numpy が必要"
+else
+    # 1. 統計量の計算
+    echo "1. 統計量計算テスト..." >&2
+
+    STATS_OUTPUT=$($PYTHON_CMD -c "
+import sys
+import numpy as np
+sys.path.insert(0, '.')
+from cohort import robust_statistics
+
+matrix = np.array([[0, 10], [0, 12], [0, np.nan], [5, 11]], dtype=float)
+stats = robust_statistics(np, matrix)
+if list(stats['median']) != [0, 11] or stats['counts'][1] != 3:
+    print(f'中央値不正: {stats[\"median\"]}')
+    sys.exit(1)
+if not np.isnan(stats['z'][2, 1]) or stats['z'][3, 0] <= 0:
+    print(f'Zスコア不正: {stats[\"z\"]}')
+    sys.exit(1)
+if stats['percentile'][3, 0] != 100 or stats['percentile'][1, 1] != 100 or stats['percentile'][0, 1] != 0:
+    print(f'パーセンタイル不正: {stats[\"percentile\"]}')
+    sys.exit(1)
+print('中央値・Zスコア・パーセンタイル正常')
+" 2>&1)
+
+    if [ $? -eq 0 ]; then
+        test_result "統計量計算" "PASS" "$STATS_OUTPUT"
+    else
+        test_result "統計量計算" "FAIL" "$STATS_OUTPUT"
+    fi
+
+    # 2. 外れ値・集団劣化の検出（2ホスト分を集約）
+    echo "" >&2
+    echo "2. 外れ値・集団劣化検出テスト..." >&2
+
+    COHORT_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from cohort import analyze_cohorts
+
+def device(serial, model, pending, reallocated=0):
+    return {
+        '_device_path': f'/dev/{serial}',
+        'serial_number': serial,
+        'model_name': model,
+        'firmware_version': '1.0',
+        'ata_smart_attributes': {'table': [
+            {'name': 'Current_Pending_Sector', 'raw': {'string': str(pending)}},
+            {'name': 'Reallocated_Sector_Ct', 'raw': {'string': str(reallocated)}},
+        ]}
+    }
+
+host1 = [device(f'A{i}', 'Model A', 0) for i in range(4)] + [device('B0', 'Model B', 3)]
+host2 = [device(f'A{i}', 'Model A', 0) for i in range(4, 8)] + [device('A8', 'Model A', 0, 40)]
+host2 += [device(f'B{i}', 'Model B', 3) for i in range(1, 4)]
+before = [[device(f'B{i}', 'Model B', 0) for i in range(4)]]
+
+result = analyze_cohorts([host1, host2], before)
+attributes = sorted((issue['device'], issue['attribute']) for issue in result['issues'])
+expected = [('/dev/A8', 'cohort:Reallocated_Sector_Ct'), ('cohort:Model B/1.0', 'cohort_degrading:Current_Pending_Sector')]
+if attributes != expected:
+    print(f'検出結果不正: {attributes}')
+    sys.exit(1)
+sizes = {c['model']: c['size'] for c in result['cohorts']}
+if sizes != {'Model A': 9, 'Model B': 4}:
+    print(f'コホート集計不正: {sizes}')
+    sys.exit(1)
+print(f'検出: {len(result[\"issues\"])}件')
+" 2>&1)
+
+    if [ $? -eq 0 ]; then
+        test_result "外れ値・集団劣化検出" "PASS" "$COHORT_OUTPUT"
+    else
+        test_result "外れ値・集団劣化検出" "FAIL" "$COHORT_OUTPUT"
+    fi
+
+    # 2b. わずかな差は外れ値にしない（ばらつきの下限）
+    FLOOR_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from cohort import analyze_cohorts
+
+def device(index, name, value):
+    return {
+        '_device_path': f'/dev/sd{index}',
+        'serial_number': f'F{index}',
+        'model_name': 'Model F',
+        'firmware_version': '1.0',
+        'ata_smart_attributes': {'table': [{'name': name, 'raw': {'string': str(value)}}]}
+    }
+
+temperatures = [device(i, 'Temperature_Celsius', value) for i, value in enumerate([35, 35, 35, 35, 36])]
+load_cycles = [device(i, 'Load_Cycle_Count', 1001 if i == 7 else 1000) for i in range(8)]
+for snapshot in (temperatures, load_cycles):
+    issues = analyze_cohorts([snapshot])['issues']
+    if issues:
+        print(f'わずかな差が外れ値になりました: {issues}')
+        sys.exit(1)
+
+hot = [device(i, 'Temperature_Celsius', 50 if i == 4 else 35) for i in range(5)]
+if [issue['device'] for issue in analyze_cohorts([hot])['issues']] != ['/dev/sd4']:
+    print('明確な外れ値が検出されません')
+    sys.exit(1)
+print('35/35/35/35/36℃・1000/1001回は対象外、50℃は検出')
+" 2>&1)
+
+    if [ $? -eq 0 ]; then
+        test_result "ばらつきの下限" "PASS" "$FLOOR_OUTPUT"
+    else
+        test_result "ばらつきの下限" "FAIL" "$FLOOR_OUTPUT"
+    fi
+
+    # 3. 複数日の履歴に対する分析（1ヶ月前との比較で集団劣化を検出）
+    echo "" >&2
+    echo "3. 履歴分析テスト..." >&2
+
+    rm -rf test_data_cohort
+    mkdir -p test_data_cohort
+    sed 's/"llm_backend": "gemini"/"llm_backend": "stub"/' settings.json.template > test_data_cohort/settings.json
+
+    HISTORY_OUTPUT=$($PYTHON_CMD -c "
+import datetime
+import json
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, os.getcwd())
+os.chdir('test_data_cohort')
+
+# 40日分の毎時データ: 20日前に4台とも再配置セクタが0→5
+now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+for hours in range(40 * 24, -1, -1):
+    collected = now - datetime.timedelta(hours=hours)
+    reallocated = 5 if hours < 20 * 24 else 0
+    snapshot = [{
+        '_device_path': f'/dev/sd{letter}',
+        '_collection_timestamp': collected.isoformat(),
+        'serial_number': f'S{letter}',
+        'model_name': 'Model A',
+        'firmware_version': '1.0',
+        'ata_smart_attributes': {'table': [
+            {'name': 'Reallocated_Sector_Ct', 'raw': {'string': str(reallocated)}}
+        ]}
+    } for letter in 'abcd']
+    month_dir = Path('data/smart') / collected.strftime('%Y-%m')
+    month_dir.mkdir(parents=True, exist_ok=True)
+    with open(month_dir / collected.strftime('smart_%Y%m%d_%H%M%S.json'), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+import main
+main.analyze_data()
+
+analysis_file = sorted(Path('data/smart').glob('*/analysis_*.json'))[-1]
+with open(analysis_file, encoding='utf-8') as f:
+    analyses = json.load(f)
+types = [analysis['analysis_type'] for analysis in analyses]
+for expected in ('current', 'daily', 'weekly', 'monthly', 'cohort'):
+    if expected not in types:
+        print(f'{expected} の分析がありません: {types}')
+        sys.exit(1)
+cohort = [analysis for analysis in analyses if analysis['analysis_type'] == 'cohort'][0]
+if [issue['attribute'] for issue in cohort['issues']] != ['cohort_degrading:Reallocated_Sector_Ct']:
+    print(f'集団劣化が検出されません: {cohort[\"issues\"]}')
+    sys.exit(1)
+print(f'分析: {types}')
+" 2>/dev/null)
+
+    if [ $? -eq 0 ]; then
+        test_result "履歴分析" "PASS" "$HISTORY_OUTPUT"
+    else
+        test_result "履歴分析" "FAIL" "$HISTORY_OUTPUT"
+    fi
+    rm -rf test_data_cohort
+fi
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "コホート分析テスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全てのコホート分析テストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかのコホート分析テストが失敗しました。" >&2
+    exit 1
+fi
@@ -0,0 +1,202 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テストクリーンアップ
+function cleanup_test() {
+    rm -f test_settings.json
+}
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム 設定管理テスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# 1. テンプレートの検証
+echo "1. settings.json.template検証テスト..." >&2
+
+TEMPLATE_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from config import read_config_file
+
+try:
+    config = read_config_file('settings.json.template')
+    print(f'収集間隔: {config.collection_interval_hours}時間')
+except Exception as e:
+    print(f'エラー: {e}')
+    sys.exit(1)
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "テンプレート検証" "PASS" "$TEMPLATE_OUTPUT"
+else
+    test_result "テンプレート検証" "FAIL" "$TEMPLATE_OUTPUT"
+fi
+
+# 2. 不正な値の拒否
+echo "" >&2
+echo "2. 不正値拒否テスト..." >&2
+
+INVALID_OUTPUT=$($PYTHON_CMD -c "
+import sys
+sys.path.insert(0, '.')
+from config import parse_config, ConfigError
+
+cases = [
+    {'collection_interval_hours': 'x'},
+    {'collection_interval_hours': 0},
+    {'llm_max_calls': 1.5},
+    {'llm_max_calls': True},
+    [],
+]
+for case in cases:
+    try:
+        parse_config(case)
+        print(f'拒否されませんでした: {case}')
+        sys.exit(1)
+    except ConfigError:
+        pass
+print(f'{len(cases)}件すべて拒否')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "不正値拒否" "PASS" "$INVALID_OUTPUT"
+else
+    test_result "不正値拒否" "FAIL" "$INVALID_OUTPUT"
+fi
+
+# 3. 変更検知と不正な変更時の設定維持
+echo "" >&2
+echo "3. 設定再読み込みテスト..." >&2
+
+echo '{"collection_interval_hours": 1}' > test_settings.json
+
+RELOAD_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+sys.path.insert(0, '.')
+from config import ConfigManager
+
+manager = ConfigManager('test_settings.json')
+manager.load()
+
+def rewrite(text, offset):
+    with open('test_settings.json', 'w', encoding='utf-8') as f:
+        f.write(text)
+    st = os.stat('test_settings.json')
+    os.utime('test_settings.json', ns=(st.st_atime_ns, st.st_mtime_ns + offset))
+
+# 不正なJSONは拒否され直前の設定を維持
+rewrite('{\"collection_interval_hours\": ', 10**9)
+if manager.reload_if_changed() or manager.get().collection_interval_hours != 1:
+    print('不正な変更が反映されました')
+    sys.exit(1)
+
+# 正しい変更は反映
+rewrite('{\"collection_interval_hours\": 2}', 2 * 10**9)
+if not manager.reload_if_changed() or manager.get().collection_interval_hours != 2:
+    print('正しい変更が反映されませんでした')
+    sys.exit(1)
+
+# 変更がなければ再読み込みしない
+if manager.reload_if_changed():
+    print('未変更で再読み込みされました')
+    sys.exit(1)
+
+# ファイルが消えても設定を維持し、エラーは状態が変わったときに1回だけ出す
+import contextlib
+import io
+os.rename('test_settings.json', 'test_settings.json.bak')
+errors = io.StringIO()
+with contextlib.redirect_stderr(errors):
+    for _ in range(3):
+        manager.reload_if_changed()
+if errors.getvalue().count('設定ファイル確認エラー') != 1 or manager.get().collection_interval_hours != 2:
+    print(f'ファイル消失時の動作不正: {errors.getvalue()}')
+    sys.exit(1)
+
+# 復帰後の変更は再び反映される
+os.rename('test_settings.json.bak', 'test_settings.json')
+manager.reload_if_changed()
+rewrite('{\"collection_interval_hours\": 3}', 3 * 10**9)
+if not manager.reload_if_changed() or manager.get().collection_interval_hours != 3:
+    print('ファイル復帰後の変更が反映されません')
+    sys.exit(1)
+print('再読み込み動作正常')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "設定再読み込み" "PASS" "$RELOAD_OUTPUT"
+else
+    test_result "設定再読み込み" "FAIL" "$RELOAD_OUTPUT"
+fi
+
+# クリーンアップ
+cleanup_test
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "設定管理テスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全ての設定管理テストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかの設定管理テストが失敗しました。" >&2
+    exit 1
+fi
@@ -0,0 +1,175 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テストクリーンアップ
+function cleanup_test() {
+    rm -rf test_data/
+}
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム エクスポートテスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# テスト用履歴データ作成（3日分・6時間ごと・2デバイス）
+mkdir -p test_data
+
+$PYTHON_CMD -c "
+import datetime
+import json
+import os
+
+os.chdir('test_data')
+start = datetime.datetime(2025, 1, 30)
+for step in range(12):
+    collected = start + datetime.timedelta(hours=6 * step)
+    snapshot = [{
+        '_device_path': '/dev/sda',
+        '_collection_timestamp': collected.isoformat(),
+        'serial_number': 'TEST0',
+        'model_name': 'Test Drive',
+        'ata_smart_attributes': {'table': [
+            {'name': 'Reallocated_Sector_Ct', 'value': 100, 'worst': 100, 'thresh': 10, 'raw': {'value': 0, 'string': '0'}},
+            {'name': 'Power_On_Hours', 'value': 99, 'worst': 99, 'thresh': 0, 'raw': {'value': step, 'string': str(step)}},
+        ]}
+    }, {
+        '_device_path': '/dev/nvme0n1',
+        '_collection_timestamp': collected.isoformat(),
+        'serial_number': 'TEST1',
+        'model_name': 'Test NVMe',
+        'nvme_smart_health_information_log': {'media_errors': 0, 'temperature': 40},
+    }]
+    month_dir = f'data/smart/{collected.year:04d}-{collected.month:02d}'
+    os.makedirs(month_dir, exist_ok=True)
+    with open(f'{month_dir}/smart_{collected.strftime(\"%Y%m%d_%H%M%S\")}.json', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+"
+
+# 1. JSONL出力（期間・デバイス・属性の絞り込み）
+echo "1. JSONL出力テスト..." >&2
+
+JSONL_OUTPUT=$(cd test_data && $PYTHON_CMD ../cli.py export --from 2025-01-31 --to 2025-02-01 --device TEST0 --attrs Power_On_Hours 2>/dev/null)
+
+CHECK_OUTPUT=$(echo "$JSONL_OUTPUT" | $PYTHON_CMD -c "
+import json
+import sys
+
+rows = [json.loads(line) for line in sys.stdin if line.strip()]
+if len(rows) != 8:
+    print(f'行数不正: {len(rows)}')
+    sys.exit(1)
+if any(row['attribute'] != 'Power_On_Hours' or row['serial'] != 'TEST0' for row in rows):
+    print('絞り込み不正')
+    sys.exit(1)
+timestamps = [row['timestamp'] for row in rows]
+if timestamps != sorted(timestamps) or not timestamps[0].startswith('2025-01-31'):
+    print(f'順序・期間不正: {timestamps}')
+    sys.exit(1)
+print(f'{len(rows)}行を時刻順に出力')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "JSONL出力" "PASS" "$CHECK_OUTPUT"
+else
+    test_result "JSONL出力" "FAIL" "$CHECK_OUTPUT"
+fi
+
+# 2. CSV/TSVファイル出力
+echo "" >&2
+echo "2. CSV/TSV出力テスト..." >&2
+
+(cd test_data && $PYTHON_CMD ../cli.py export --format csv --output export.csv 2>/dev/null)
+(cd test_data && $PYTHON_CMD ../cli.py export --format tsv --device /dev/nvme0n1 --output export.tsv 2>/dev/null)
+
+DELIMITED_OUTPUT=$($PYTHON_CMD -c "
+import csv
+import sys
+
+with open('test_data/export.csv', encoding='utf-8') as f:
+    csv_rows = list(csv.DictReader(f))
+with open('test_data/export.tsv', encoding='utf-8') as f:
+    tsv_rows = list(csv.DictReader(f, delimiter='\t'))
+if len(csv_rows) != 12 * 4:
+    print(f'CSV行数不正: {len(csv_rows)}')
+    sys.exit(1)
+if len(tsv_rows) != 12 * 2 or {row['attribute'] for row in tsv_rows} != {'media_errors', 'temperature'}:
+    print(f'TSV内容不正: {len(tsv_rows)}')
+    sys.exit(1)
+print(f'CSV {len(csv_rows)}行 / TSV {len(tsv_rows)}行')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "CSV/TSV出力" "PASS" "$DELIMITED_OUTPUT"
+else
+    test_result "CSV/TSV出力" "FAIL" "$DELIMITED_OUTPUT"
+fi
+
+# クリーンアップ
+cleanup_test
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "エクスポートテスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全てのエクスポートテストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかのエクスポートテストが失敗しました。" >&2
+    exit 1
+fi
@@ -0,0 +1,184 @@
+#!/bin/bash
+
+umask 077
+set -uo pipefail
+
+RUN_PATH=`pwd`
+EXE_PATH=`dirname "${0}"`
+EXE_NAME=`basename "${0}"`
+cd "${EXE_PATH}"
+EXE_PATH=`pwd`
+cd ..
+
+# テスト結果カウンター
+PASS_COUNT=0
+FAIL_COUNT=0
+TEST_COUNT=0
+
+# テスト結果表示関数
+function test_result() {
+    local test_name="$1"
+    local result="$2"
+    local details="$3"
+
+    TEST_COUNT=$((TEST_COUNT + 1))
+
+    if [ "$result" = "PASS" ]; then
+        echo "✓ PASS: $test_name" >&2
+        PASS_COUNT=$((PASS_COUNT + 1))
+    else
+        echo "✗ FAIL: $test_name - $details" >&2
+        FAIL_COUNT=$((FAIL_COUNT + 1))
+    fi
+}
+
+# Pythonコマンド検出
+PYTHON_CMD=""
+if command -v python3 >/dev/null 2>&1; then
+    PYTHON_CMD="python3"
+elif command -v python >/dev/null 2>&1; then
+    PYTHON_VERSION=$(python --version 2>&1)
+    if echo "$PYTHON_VERSION" | grep -q "Python 3"; then
+        PYTHON_CMD="python"
+    fi
+fi
+
+if [ -z "$PYTHON_CMD" ]; then
+    echo "エラー: Python 3が見つかりません" >&2
+    exit 1
+fi
+
+# テスト開始
+echo "========================================" >&2
+echo "SMART監視システム 状態要約テスト開始" >&2
+echo "========================================" >&2
+echo "" >&2
+
+# テスト用ディレクトリ
+TEST_DIR="test_data_status"
+
+cleanup_test() {
+    rm -rf "$TEST_DIR"
+}
+
+cleanup_test
+mkdir -p "$TEST_DIR"
+
+# 1. 要約ファイルの更新
+echo "1. 要約ファイル更新テスト..." >&2
+
+UPDATE_OUTPUT=$($PYTHON_CMD -c "
+import os
+import sys
+sys.path.insert(0, os.getcwd())
+os.chdir('$TEST_DIR')
+from latest_status import STATUS_FILE, update_status, read_status
+
+update_status('collection', {'timestamp': '2025-01-01T00:00:00', 'devices': {
+    '/dev/sda': {'health': 'ok'}, '/dev/sdb': {'health': 'critical'}}})
+first_inode = os.stat(STATUS_FILE).st_ino
+update_status('analysis', {'timestamp': '2025-01-01T01:00:00', 'severity': 'warning',
+                           'analyses_count': 4, 'issues_count': 2, 'by_severity': {'warning': 2}})
+
+status = read_status()
+if set(status) != {'collection', 'analysis', 'updated_at'}:
+    print(f'セクションが統合されていません: {list(status)}')
+    sys.exit(1)
+# 一時ファイルからの置き換え（同じファイルへの上書きではない）
+if os.stat(STATUS_FILE).st_ino == first_inode:
+    print('要約ファイルがアトミックに置き換えられていません')
+    sys.exit(1)
+leftovers = [name for name in os.listdir(STATUS_FILE.parent) if name.endswith('.tmp')]
+if leftovers:
+    print(f'一時ファイルが残っています: {leftovers}')
+    sys.exit(1)
+print('collection/analysisを統合して置き換え')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "要約ファイル更新" "PASS" "$UPDATE_OUTPUT"
+else
+    test_result "要約ファイル更新" "FAIL" "$UPDATE_OUTPUT"
+fi
+
+# 2. cli.py status の出力と読み込みモジュール
+echo "" >&2
+echo "2. 状態表示テスト..." >&2
+
+STATUS_OUTPUT=$($PYTHON_CMD -c "
+import contextlib
+import io
+import json
+import os
+import runpy
+import sys
+preloaded = set(sys.modules)
+cli_path = os.path.join(os.getcwd(), 'cli.py')
+sys.path.insert(0, os.getcwd())
+os.chdir('$TEST_DIR')
+
+def run_status():
+    sys.argv = ['cli.py', 'status']
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            runpy.run_path(cli_path, run_name='__main__')
+        except SystemExit as e:
+            if e.code:
+                print(f'終了コード: {e.code}', file=sys.stderr)
+                sys.exit(1)
+    return json.loads(out.getvalue())
+
+status = run_status()
+if status['device_health'] != {'/dev/sda': 'ok', '/dev/sdb': 'critical'}:
+    print(f'デバイス健全性不正: {status[\"device_health\"]}')
+    sys.exit(1)
+if status['last_analysis_severity'] != 'warning' or status['last_analysis_counts']['issues'] != 2:
+    print(f'分析要約不正: {status}')
+    sys.exit(1)
+# 書き込み側のモジュール（tempfile）も読み込まない（起動時に読み込み済みの環境は除く）
+loaded = [name for name in ('main', 'requests', 'numpy', 'tempfile') if name in sys.modules and name not in preloaded]
+if loaded:
+    print(f'不要なモジュールを読み込んでいます: {loaded}')
+    sys.exit(1)
+
+# 設定ファイルは存在するだけでなくJSONとして読み込めるかを表示する
+config_states = [status['config_loaded']]
+with open('settings.json', 'w', encoding='utf-8') as f:
+    f.write('{broken')
+config_states.append(run_status()['config_loaded'])
+with open('settings.json', 'w', encoding='utf-8') as f:
+    f.write('{}')
+config_states.append(run_status()['config_loaded'])
+if config_states != [False, False, True]:
+    print(f'設定読み込み状態不正（なし・不正・正常）: {config_states}')
+    sys.exit(1)
+print('要約ファイルのみから健全性・重要度・設定状態を表示（main/requestsは未読み込み）')
+" 2>&1)
+
+if [ $? -eq 0 ]; then
+    test_result "状態表示" "PASS" "$STATUS_OUTPUT"
+else
+    test_result "状態表示" "FAIL" "$STATUS_OUTPUT"
+fi
+
+cleanup_test
+
+# テスト結果サマリー
+echo "" >&2
+echo "========================================" >&2
+echo "状態要約テスト結果サマリー" >&2
+echo "========================================" >&2
+echo "実行テスト数: $TEST_COUNT" >&2
+echo "成功: $PASS_COUNT" >&2
+echo "失敗: $FAIL_COUNT" >&2
+
+if [ $FAIL_COUNT -eq 0 ]; then
+    echo "" >&2
+    echo "✓ 全ての状態要約テストが成功しました！" >&2
+    exit 0
+else
+    echo "" >&2
+    echo "✗ いくつかの状態要約テストが失敗しました。" >&2
+    exit 1
+fi